@@ -0,0 +1,244 @@
+"""
+This module contains a Flask API serving the gold layer (data/gold_layer/).
+
+Gold files are loaded once into an in-memory cache, where every response is pre-serialized (plain and gzip bytes)
+with its ETag, indexed by (code_commune, annee, type_local). Requests only look responses up: no CSV is read or
+parsed while serving. A background thread watches the modification times of the gold files, and swaps in a
+rebuilt cache when they change.
+
+Endpoints:
+* GET /api/prices?code_commune=75101&annee=2023&type_local=Appartement: aggregated prices by number of rooms,
+  every filter being optional.
+* GET /api/choropleth?annee=2023&type_local=Appartement: arrondissements GeoJSON with prices joined into the
+  feature properties, both filters being optional.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from itertools import product
+from pathlib import Path
+
+import pandas as pd
+from flask import Flask, Response, abort, request
+
+ROOT = Path(__file__).resolve().parents[1]
+GOLD_DIR = ROOT / "data" / "gold_layer"
+
+AGG_FILE = "agg_dvf_data.csv"
+CUBE_FILE = "agg_dvf_cube.csv"
+GEOJSON_FILE = "arrondissements.geojson"
+
+# seconds between two checks of the gold files modification times
+DEFAULT_POLL_INTERVAL = 2.0
+
+INDEX_KEYS = ["code_commune", "annee", "type_local"]
+
+
+def _serialize(payload) -> dict:
+    """
+    Serialize a payload once: JSON bytes, gzip bytes and ETag.
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "body": body,
+        "gzip": gzip.compress(body, mtime=0),
+        "etag": hashlib.sha1(body).hexdigest(),
+    }
+
+
+def _gold_mtimes(gold_dir: Path) -> dict:
+    """
+    Return the modification time of each gold file, None for missing files.
+    """
+    mtimes = {}
+    for file_name in (AGG_FILE, CUBE_FILE, GEOJSON_FILE):
+        file_path = gold_dir / file_name
+        mtimes[file_name] = file_path.stat().st_mtime_ns if file_path.exists() else None
+    return mtimes
+
+
+def _build_price_series(agg_df: pd.DataFrame) -> dict:
+    """
+    Pre-serialize the price series of every (code_commune, annee, type_local) combination, None matching any value.
+    """
+    agg_df = agg_df.sort_values(INDEX_KEYS + ["nombre_pieces_principales"], ignore_index=True)
+    # Python floats serialize with their shortest round-trip repr, like the gold CSV; to_json would round them
+    records = agg_df.astype(object).where(agg_df.notna(), None).to_dict("records")
+    groups = {}
+    for record in records:
+        key = tuple(record[k] for k in INDEX_KEYS)
+        for wildcards in product((False, True), repeat=len(INDEX_KEYS)):
+            lookup = tuple(None if wildcard else value for value, wildcard in zip(key, wildcards))
+            groups.setdefault(lookup, []).append(record)
+    return {lookup: _serialize(rows) for lookup, rows in groups.items()}
+
+
+def _build_choropleths(geojson: dict, cube: pd.DataFrame | None, agg_df: pd.DataFrame) -> dict:
+    """
+    Pre-serialize the arrondissements GeoJSON for every (annee, type_local) combination, None matching any value,
+    with nb_ventes and the p25/p50/p75 price per square meter of the arrondissement in the feature properties.
+    Prices come from the rollup cube; without it, only nb_ventes is joined.
+    """
+    annees = [None] + sorted(agg_df["annee"].dropna().astype(int).unique().tolist())
+    types_local = [None] + sorted(agg_df["type_local"].dropna().unique().tolist())
+    price_columns = ["prix_m2_p25", "prix_m2_p50", "prix_m2_p75"]
+
+    choropleths = {}
+    for annee, type_local in product(annees, types_local):
+        keys = ["code_commune"] + (["annee"] if annee is not None else []) + (["type_local"] if type_local is not None else [])
+        if cube is not None:
+            cells = cube[cube["grouping"] == ",".join(keys)]
+        else:
+            cells = agg_df.groupby(keys, as_index=False)["nb_ventes"].sum()
+        if annee is not None:
+            cells = cells[cells["annee"] == annee]
+        if type_local is not None:
+            cells = cells[cells["type_local"] == type_local]
+        by_commune = {
+            int(row["code_commune"]): {
+                "nb_ventes": int(row["nb_ventes"]),
+                **{column: (float(row[column]) if column in row and pd.notna(row[column]) else None)
+                   for column in price_columns},
+            }
+            for _, row in cells.iterrows()
+        }
+
+        features = []
+        for feature in geojson["features"]:
+            code_commune = int(feature["properties"]["c_arinsee"])
+            prices = by_commune.get(code_commune, {"nb_ventes": 0, **dict.fromkeys(price_columns)})
+            features.append({
+                **feature,
+                "properties": {**feature["properties"], "code_commune": code_commune, **prices},
+            })
+        choropleths[(annee, type_local)] = _serialize({"type": "FeatureCollection", "features": features})
+    return choropleths
+
+
+def build_gold_cache(gold_dir: Path = GOLD_DIR) -> dict:
+    """
+    Load the gold files and pre-serialize every response.
+    Args:
+        gold_dir (Path): Gold layer directory.
+    Returns:
+        dict: {"mtimes": dict, "prices": dict, "choropleths": dict, "empty": dict}.
+    """
+    mtimes = _gold_mtimes(gold_dir)
+    agg_df = pd.read_csv(gold_dir / AGG_FILE, sep=";", encoding="utf-8", header=0, float_precision="round_trip")
+    cube = None
+    if mtimes[CUBE_FILE] is not None:
+        cube = pd.read_csv(gold_dir / CUBE_FILE, sep=";", encoding="utf-8", header=0, float_precision="round_trip")
+    with open(gold_dir / GEOJSON_FILE, encoding="utf-8") as f:
+        geojson = json.load(f)
+    return {
+        "mtimes": mtimes,
+        "prices": _build_price_series(agg_df),
+        "choropleths": _build_choropleths(geojson, cube, agg_df),
+        "empty": _serialize([]),
+    }
+
+
+class GoldCacheWatcher:
+    """
+    Hold the current gold cache and rebuild it in a background thread when the gold files change.
+    Readers take `watcher.cache` once per request; a rebuilt cache replaces it in a single assignment.
+    """
+
+    def __init__(self, gold_dir: Path = GOLD_DIR, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.gold_dir = gold_dir
+        self.poll_interval = poll_interval
+        self.cache = build_gold_cache(gold_dir)
+        self._thread = None
+
+    def reload_if_changed(self) -> bool:
+        """
+        Rebuild the cache if the modification time of a gold file changed.
+        A failed rebuild (e.g. a file being rewritten) keeps the current cache and is retried at the next poll.
+        """
+        if _gold_mtimes(self.gold_dir) == self.cache["mtimes"]:
+            return False
+        try:
+            cache = build_gold_cache(self.gold_dir)
+        except (OSError, ValueError, KeyError, pd.errors.ParserError):
+            return False
+        self.cache = cache
+        return True
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            self.reload_if_changed()
+
+    def start(self) -> None:
+        """
+        Start watching the gold files in a daemon thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="gold-cache-watcher", daemon=True)
+            self._thread.start()
+
+
+def _respond(entry: dict) -> Response:
+    """
+    Return a pre-serialized response, 304 if the client already has it, gzip if the client accepts it
+    (a quality value of 0, as in "gzip;q=0", refuses it).
+    """
+    if request.if_none_match.contains(entry["etag"]):
+        response = Response(status=304)
+    elif request.accept_encodings["gzip"] > 0:
+        response = Response(entry["gzip"], mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(entry["body"], mimetype="application/json")
+    response.set_etag(entry["etag"])
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _int_arg(name: str) -> int | None:
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(400, f"{name} must be an integer")
+
+
+def create_app(gold_dir: Path = GOLD_DIR, poll_interval: float | None = DEFAULT_POLL_INTERVAL) -> Flask:
+    """
+    Create the Flask application serving the gold layer.
+    Args:
+        gold_dir (Path): Gold layer directory.
+        poll_interval (float | None): Seconds between two checks of the gold files, None disables hot reload.
+    Returns:
+        Flask: Flask application.
+    """
+    app = Flask(__name__)
+    watcher = GoldCacheWatcher(gold_dir, poll_interval or DEFAULT_POLL_INTERVAL)
+    if poll_interval:
+        watcher.start()
+    app.extensions["gold_cache"] = watcher
+
+    @app.get("/api/prices")
+    def prices():
+        cache = watcher.cache
+        key = (_int_arg("code_commune"), _int_arg("annee"), request.args.get("type_local"))
+        return _respond(cache["prices"].get(key, cache["empty"]))
+
+    @app.get("/api/choropleth")
+    def choropleth():
+        cache = watcher.cache
+        entry = cache["choropleths"].get((_int_arg("annee"), request.args.get("type_local")))
+        if entry is None:
+            abort(404)
+        return _respond(entry)
+
+    return app
+
+
+if __name__ == "__main__":
+    create_app().run()
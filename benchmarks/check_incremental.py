@@ -0,0 +1,165 @@
+"""
+This module checks that incremental silver/gold rebuilds give the same outputs as a full rebuild.
+
+On synthetic bronze data, a work directory goes through a sequence of runs mixing bronze changes, incremental runs and
+non-incremental rebuilds: an incremental gold run right after a non-incremental silver rebuild must be refused, since
+the manifest no longer describes silver. A second directory is rebuilt from scratch on the final bronze files, and the silver, gold and
+cube outputs of both directories are compared, for CSV and Parquet storage.
+
+Usage:
+    python benchmarks/check_incremental.py --rows 100000 --work-dir /tmp/dvf_check
+"""
+
+import argparse
+import filecmp
+import shutil
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "etl"))
+
+import aggregate  # noqa: E402
+from clean import DVF_YEARS, build_silver, silver_output_path, update_silver_incrementally  # noqa: E402
+from storage import read_partitioned  # noqa: E402
+from synthetic_dvf import generate_bronze  # noqa: E402
+
+
+@contextmanager
+def _layers(work_dir: Path):
+    """
+    Point the silver and gold layers of the aggregation at a work directory.
+    """
+    previous = aggregate.SILVER_DIR, aggregate.GOLD_DIR
+    aggregate.SILVER_DIR, aggregate.GOLD_DIR = work_dir / "silver", work_dir / "gold"
+    try:
+        yield
+    finally:
+        aggregate.SILVER_DIR, aggregate.GOLD_DIR = previous
+
+
+def _silver_path(work_dir: Path, storage: str) -> Path:
+    return work_dir / "silver" / silver_output_path("cleaned_dvf_data", storage).name
+
+
+def _drop_rows(bronze_dir: Path, year: int, step: int) -> None:
+    """
+    Drop every `step`-th data row of a bronze file.
+    """
+    file_path = bronze_dir / f"dvf_75_{year}.csv"
+    lines = file_path.read_text(encoding="utf-8").splitlines(keepends=True)
+    file_path.write_text(lines[0] + "".join(line for i, line in enumerate(lines[1:]) if i % step), encoding="utf-8")
+
+
+def _incremental_run(work_dir: Path, storage: str) -> None:
+    manifest_path = work_dir / "manifest.json"
+    update_silver_incrementally(
+        _silver_path(work_dir, storage), storage, bronze_dir=work_dir / "bronze", manifest_path=manifest_path, workers=1
+    )
+    with _layers(work_dir):
+        aggregate.update_gold_incrementally(storage, manifest_path=manifest_path)
+
+
+def _full_run(work_dir: Path, storage: str, gold: bool = True) -> None:
+    """
+    Rebuild silver, and gold unless gold is False, like clean.main() and aggregate.main().
+    """
+    manifest_path = work_dir / "manifest.json"
+    build_silver(_silver_path(work_dir, storage), storage, workers=1, bronze_dir=work_dir / "bronze", manifest_path=manifest_path)
+    if not gold:
+        return
+    with _layers(work_dir):
+        silver = aggregate.read_silver_dvf_data(storage)
+        aggregate.save_dvf_cube(*aggregate.build_dvf_cube(silver))
+        agg_df = aggregate.agg_dvf_by_arr_year(silver)
+        if storage == "parquet":
+            aggregate.save_to_gold(agg_df, work_dir / "gold" / "agg_dvf_data", storage)
+        aggregate.save_to_gold(agg_df, work_dir / "gold" / "agg_dvf_data.csv")
+        aggregate.record_gold_manifest(storage, manifest_path)
+
+
+def _read_dataset(path: Path) -> pd.DataFrame:
+    df = read_partitioned(path)
+    return df.sort_values(list(df.columns), ignore_index=True)
+
+
+def check_incremental(n_rows: int, work_dir: Path, storage: str, seed: int = 0) -> list[str]:
+    """
+    Run the incremental sequence and a full rebuild, and compare their outputs.
+    Args:
+        n_rows (int): Number of synthetic bronze rows.
+        work_dir (Path): Directory of the runs, emptied first.
+        storage (str): "csv" or "parquet".
+        seed (int): Random seed of the synthetic data.
+    Returns:
+        list[str]: Outputs that differ, empty if the incremental outputs match the full rebuild.
+    """
+    incremental_dir, full_dir = work_dir / f"incremental_{storage}", work_dir / f"full_{storage}"
+    for run_dir in (incremental_dir, full_dir):
+        if run_dir.exists():
+            shutil.rmtree(run_dir)
+    generate_bronze(incremental_dir / "bronze", n_rows, seed=seed)
+    years = list(DVF_YEARS)
+
+    differences = []
+    _incremental_run(incremental_dir, storage)
+    _drop_rows(incremental_dir / "bronze", years[-1], 2)
+    _full_run(incremental_dir, storage, gold=False)
+    try:
+        with _layers(incremental_dir):
+            aggregate.update_gold_incrementally(storage, manifest_path=incremental_dir / "manifest.json")
+        differences.append(f"{storage}: incremental gold run accepted a silver layer rebuilt outside the manifest")
+    except ValueError:
+        pass
+    _incremental_run(incremental_dir, storage)
+    _drop_rows(incremental_dir / "bronze", years[1], 7)
+    _full_run(incremental_dir, storage)
+    # the silver entry was dropped by the full run, so this incremental run rebuilds everything...
+    _drop_rows(incremental_dir / "bronze", years[2], 5)
+    _incremental_run(incremental_dir, storage)
+    # ...and this one merges the re-cleaned year into the existing outputs
+    _drop_rows(incremental_dir / "bronze", years[3], 3)
+    _incremental_run(incremental_dir, storage)
+
+    shutil.copytree(incremental_dir / "bronze", full_dir / "bronze")
+    _full_run(full_dir, storage)
+
+    outputs = [
+        Path("silver") / _silver_path(full_dir, storage).name,
+        Path("gold") / "agg_dvf_data.csv",
+        Path("gold") / aggregate.CUBE_FILE,
+        Path("gold") / aggregate.CUBE_CENTROIDS_FILE,
+    ]
+    if storage == "parquet":
+        outputs.append(Path("gold") / "agg_dvf_data")
+    for output in outputs:
+        incremental_path, full_path = incremental_dir / output, full_dir / output
+        if full_path.is_dir():
+            # Parquet datasets: same rows, whatever the files they are split into
+            try:
+                pd.testing.assert_frame_equal(_read_dataset(incremental_path), _read_dataset(full_path), check_exact=True)
+            except AssertionError as error:
+                differences.append(f"{storage} {output}: {str(error).splitlines()[0]}")
+        elif not filecmp.cmp(incremental_path, full_path, shallow=False):
+            # CSV files must be byte-identical: re-parsing both sides would hide float round-trip drift
+            differences.append(f"{storage} {output}: files differ")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that incremental rebuilds match a full rebuild.")
+    parser.add_argument("--rows", type=int, default=100_000, help="number of synthetic bronze rows")
+    parser.add_argument("--work-dir", type=Path, required=True, help="directory of the runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    differences = []
+    for storage in ("csv", "parquet"):
+        differences += check_incremental(args.rows, args.work_dir, storage, args.seed)
+    for difference in differences:
+        print(f"MISMATCH {difference}")
+    print("incremental outputs match the full rebuild" if not differences else f"{len(differences)} mismatches")
+    sys.exit(1 if differences else 0)
@@ -0,0 +1,241 @@
+"""
+This module benchmarks the ETL stages on synthetic DVF data and compares the results with a saved baseline.
+
+Each stage (read_dvf_data, clean_dvf_data, save_to_silver, agg_dvf_by_arr_year, save_to_gold) is run on the output
+of the previous one, and reported with its wall time, rows/s and the peak resident memory of the process.
+The pipeline runs once to warm up, then --repeat times: the fastest run of each stage is compared with the baseline,
+the other runs being slowed down by noise (other processes, page cache, CPU frequency). A fixed pandas workload is
+timed in every round too, and durations are compared relative to it, so that a machine running slower as a whole
+(shared CI runner, throttling) is not reported as a regression of every stage.
+With --trace-memory, the pipeline runs once more under tracemalloc (which includes NumPy and pandas buffers) to report
+the peak allocated memory of each stage: tracing slows pandas down by an order of magnitude, so it never runs in the
+timed rounds.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 1000000 --work-dir /tmp/dvf_bench --save-baseline /tmp/baseline.json
+    python benchmarks/run_benchmarks.py --rows 1000000 --work-dir /tmp/dvf_bench --baseline /tmp/baseline.json
+    python benchmarks/run_benchmarks.py --rows 100000 --work-dir /tmp/dvf_bench --trace-memory
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "etl"))
+
+from aggregate import agg_dvf_by_arr_year, save_to_gold  # noqa: E402
+from clean import clean_dvf_data, read_dvf_data, save_to_silver  # noqa: E402
+from instrumentation import peak_rss_mb  # noqa: E402
+from synthetic_dvf import generate_bronze  # noqa: E402
+
+# a stage slower than the baseline by more than this ratio is reported as a regression
+DEFAULT_TOLERANCE = 1.2
+
+# ... and by more than this number of seconds, so that the noise of very short stages is not reported
+MIN_REGRESSION_S = 0.05
+
+DEFAULT_REPEAT = 5
+
+CALIBRATION = "calibration"
+
+
+def _calibration_workload(csv: str) -> None:
+    """
+    Fixed workload exercising the same code paths as the stages: CSV parsing and writing, boolean masks and a
+    groupby median.
+    """
+    parsed = pd.read_csv(io.StringIO(csv))
+    parsed[parsed["value"] > 5000].groupby("key")["value"].median().to_csv()
+
+
+def _run_round(bronze_dir: Path, work_dir: Path, calibration_csv: str, record) -> dict:
+    """
+    Run the calibration workload and the stages once, each stage on the output of the previous one.
+    Args:
+        bronze_dir (Path): Directory of the synthetic bronze files.
+        work_dir (Path): Directory of the benchmark outputs.
+        calibration_csv (str): Input of the calibration workload.
+        record (Callable): record(name, func) runs func, measures it and returns its result.
+    Returns:
+        dict: Number of input rows of each stage.
+    """
+    record(CALIBRATION, lambda: _calibration_workload(calibration_csv))
+    raw = record("read_dvf_data", lambda: read_dvf_data(bronze_dir=bronze_dir))
+    cleaned = record("clean_dvf_data", lambda: clean_dvf_data(raw))
+    record("save_to_silver", lambda: save_to_silver(cleaned, work_dir / "silver" / "cleaned_dvf_data.csv"))
+    agg_df = record("agg_dvf_by_arr_year", lambda: agg_dvf_by_arr_year(cleaned))
+    record("save_to_gold", lambda: save_to_gold(agg_df, work_dir / "gold" / "agg_dvf_data.csv"))
+    return {
+        "read_dvf_data": None,
+        "clean_dvf_data": len(raw),
+        "save_to_silver": len(cleaned),
+        "agg_dvf_by_arr_year": len(cleaned),
+        "save_to_gold": len(agg_df),
+    }
+
+
+def run_benchmarks(
+    n_rows: int,
+    work_dir: Path,
+    seed: int = 0,
+    regenerate: bool = False,
+    repeat: int = DEFAULT_REPEAT,
+    trace_memory: bool = False,
+) -> dict:
+    """
+    Generate synthetic bronze data if needed and benchmark each stage.
+    The whole pipeline runs once to warm up, then `repeat` times, so that the runs of each stage are spread over the
+    benchmark and a transient slowdown of the machine only hits some of them.
+    Args:
+        n_rows (int): Total number of bronze rows.
+        work_dir (Path): Directory of the synthetic bronze files and of the benchmark outputs.
+        seed (int): Random seed of the synthetic data.
+        regenerate (bool): Regenerate the bronze files even if they exist.
+        repeat (int): Number of timed runs of each stage, after a warm-up run.
+        trace_memory (bool): Run the pipeline once more under tracemalloc to measure the peak allocated memory
+            of each stage.
+    Returns:
+        dict: {"rows": n_rows, "calibration_s": fastest time of the calibration workload,
+            "stages": [metrics of each stage]}.
+    """
+    bronze_dir = work_dir / f"bronze_{n_rows}_{seed}"
+    if regenerate or not bronze_dir.exists():
+        generate_bronze(bronze_dir, n_rows, seed=seed)
+    rng = np.random.default_rng(0)
+    calibration_csv = pd.DataFrame({
+        "key": rng.integers(0, 1000, 200_000),
+        "value": rng.lognormal(9, 0.3, 200_000),
+    }).to_csv(index=False)
+
+    durations, peak_rss, peak_traced = {}, {}, {}
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        durations.setdefault(name, []).append(time.perf_counter() - start)
+        peak_rss[name] = peak_rss_mb()
+        return result
+
+    def traced(name, func):
+        tracemalloc.start()
+        result = func()
+        peak_traced[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result
+
+    _run_round(bronze_dir, work_dir, calibration_csv, lambda name, func: func())
+    for _ in range(repeat):
+        rows_in = _run_round(bronze_dir, work_dir, calibration_csv, timed)
+    if trace_memory:
+        _run_round(bronze_dir, work_dir, calibration_csv, traced)
+    rows_in["read_dvf_data"] = n_rows
+
+    stages = []
+    for name, stage_rows in rows_in.items():
+        duration = min(durations[name])
+        stages.append({
+            "stage": name,
+            "rows_in": stage_rows,
+            "duration_s": round(duration, 4),
+            "median_duration_s": round(statistics.median(durations[name]), 4),
+            "repeat": repeat,
+            "rows_per_s": round(stage_rows / duration) if duration > 0 else None,
+            "peak_rss_mb": peak_rss[name],
+            "peak_traced_mb": round(peak_traced[name] / (1 << 20), 1) if name in peak_traced else None,
+        })
+    return {"rows": n_rows, "calibration_s": round(min(durations[CALIBRATION]), 4), "stages": stages}
+
+
+def _speed_ratio(results: dict, baseline: dict) -> float:
+    """
+    Return how much slower the machine ran the calibration workload than for the baseline, 1.0 if unknown.
+    """
+    if not baseline.get("calibration_s") or not results.get("calibration_s"):
+        return 1.0
+    return results["calibration_s"] / baseline["calibration_s"]
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    Compare the fastest duration and, when both runs traced it, the peak allocated memory of each stage with a baseline.
+    Baseline durations are first scaled by the ratio of the calibration times of both runs, then a duration is only
+    reported when it exceeds the scaled baseline by both the tolerance ratio and MIN_REGRESSION_S.
+    Args:
+        results (dict): Results of run_benchmarks.
+        baseline (dict): Results of a previous run, with the same number of rows.
+        tolerance (float): Maximum ratio to the baseline before a stage is reported as a regression.
+    Returns:
+        list[str]: Regression messages, empty if no stage regressed.
+    """
+    if baseline["rows"] != results["rows"]:
+        raise ValueError(f"Baseline has {baseline['rows']} rows, results have {results['rows']}")
+    speed = _speed_ratio(results, baseline)
+    baseline_stages = {stage["stage"]: stage for stage in baseline["stages"]}
+    regressions = []
+    for stage in results["stages"]:
+        reference = baseline_stages.get(stage["stage"])
+        if reference is None:
+            continue
+        reference = {**reference, "duration_s": reference["duration_s"] * speed}
+        for metric, floor in (("duration_s", MIN_REGRESSION_S), ("peak_traced_mb", 0)):
+            if not reference.get(metric) or stage[metric] is None:
+                continue
+            if stage[metric] / reference[metric] > tolerance and stage[metric] - reference[metric] > floor:
+                regressions.append(
+                    f"{stage['stage']}: {metric} {stage[metric]} vs {reference[metric]} "
+                    f"(x{stage[metric] / reference[metric]:.2f})"
+                )
+    return regressions
+
+
+def _print_table(results: dict, baseline: dict | None) -> None:
+    baseline_stages = {stage["stage"]: stage for stage in baseline["stages"]} if baseline else {}
+    speed = _speed_ratio(results, baseline) if baseline else 1.0
+    if baseline:
+        print(f"calibration: {results['calibration_s']:.4f}s, x{speed:.2f} vs baseline (ratios below are relative)")
+    print(f"{'stage':<22}{'rows in':>12}{'time (s)':>11}{'rows/s':>13}{'traced MB':>11}{'RSS MB':>9}{'vs base':>9}")
+    for stage in results["stages"]:
+        reference = baseline_stages.get(stage["stage"])
+        ratio = ""
+        if reference and reference["duration_s"]:
+            ratio = f"x{stage['duration_s'] / (reference['duration_s'] * speed):.2f}"
+        rss = f"{stage['peak_rss_mb']:.0f}" if stage["peak_rss_mb"] is not None else "-"
+        traced = f"{stage['peak_traced_mb']:.1f}" if stage["peak_traced_mb"] is not None else "-"
+        print(
+            f"{stage['stage']:<22}{stage['rows_in']:>12}{stage['duration_s']:>11.3f}{stage['rows_per_s'] or 0:>13}"
+            f"{traced:>11}{rss:>9}{ratio:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ETL stages on synthetic DVF data.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="total number of bronze rows (100k to 50M)")
+    parser.add_argument("--work-dir", type=Path, required=True, help="directory of the synthetic data and outputs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regenerate", action="store_true", help="regenerate the synthetic bronze files")
+    parser.add_argument("--baseline", type=Path, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", type=Path, help="save the results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs of each stage, after a warm-up")
+    parser.add_argument("--trace-memory", action="store_true", help="replay each stage under tracemalloc")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.work_dir, args.seed, args.regenerate, args.repeat, args.trace_memory)
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline else None
+    _print_table(results, baseline)
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
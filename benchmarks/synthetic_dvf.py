@@ -0,0 +1,163 @@
+"""
+This module generates synthetic DVF bronze files (dvf_75_{year}.csv) with realistic distributions, for benchmarks.
+
+Rows mimic the DVF geolocated open data of Paris: mutations spanning one to three rows (an apartment and its
+dependencies), mostly sales, a majority of apartments, surfaces growing with the number of rooms, prices per square
+meter depending on the arrondissement, coordinates around the arrondissement centers and a few exact duplicates.
+Files are written in chunks, so sizes up to tens of millions of rows can be generated with bounded memory.
+
+Usage:
+    python benchmarks/synthetic_dvf.py --rows 1000000 --output-dir /tmp/dvf_bench
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+ARRONDISSEMENTS_PATH = ROOT / "data" / "gold_layer" / "arrondissements.geojson"
+
+YEARS = range(2020, 2026)
+CHUNK_ROWS = 1_000_000
+
+NATURE_MUTATION = {
+    "Vente": 0.93,
+    "Vente en l'état futur d'achèvement": 0.03,
+    "Echange": 0.01,
+    "Adjudication": 0.01,
+    "Vente terrain à bâtir": 0.01,
+    "Expropriation": 0.01,
+}
+TYPE_LOCAL = {
+    "Appartement": 0.55,
+    "Dépendance": 0.30,
+    "Local industriel. commercial ou assimilé": 0.10,
+    "Maison": 0.02,
+    None: 0.03,
+}
+CODE_TYPE_LOCAL = {"Maison": 1, "Appartement": 2, "Dépendance": 3, "Local industriel. commercial ou assimilé": 4}
+ROOMS = {0: 0.01, 1: 0.27, 2: 0.32, 3: 0.2, 4: 0.11, 5: 0.05, 6: 0.02, 7: 0.01, 8: 0.005, 9: 0.005}
+
+# share of rows duplicated exactly, as found in the open data
+DUPLICATE_RATE = 0.005
+
+
+def _choice(rng: np.random.Generator, distribution: dict, size: int) -> np.ndarray:
+    values = list(distribution)
+    probabilities = np.array(list(distribution.values()), dtype=float)
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=probabilities / probabilities.sum())]
+
+
+def load_arrondissements(geojson_path: Path = ARRONDISSEMENTS_PATH) -> pd.DataFrame:
+    """
+    Return the code, center and relative weight of each arrondissement.
+    """
+    with open(geojson_path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    arrondissements = pd.DataFrame([
+        {
+            "code_commune": int(feature["properties"]["c_arinsee"]),
+            "lon": feature["properties"]["geom_x_y"]["lon"],
+            "lat": feature["properties"]["geom_x_y"]["lat"],
+            "surface": feature["properties"]["surface"],
+        }
+        for feature in features
+    ]).sort_values("code_commune", ignore_index=True)
+    # central arrondissements are more expensive and have fewer sales
+    arrondissements["weight"] = np.sqrt(arrondissements["surface"])
+    rank = arrondissements["code_commune"] - 75100
+    arrondissements["prix_m2_median"] = 13500 - 250 * rank
+    return arrondissements
+
+
+def generate_chunk(rng: np.random.Generator, n_rows: int, year: int, first_mutation: int, arrondissements: pd.DataFrame) -> pd.DataFrame:
+    """
+    Generate about n_rows synthetic DVF rows of a year, mutation ids starting at first_mutation.
+    """
+    # mutations of one to three rows share the id, date, nature and value
+    rows_per_mutation = rng.choice([1, 2, 3], size=n_rows, p=[0.7, 0.2, 0.1])
+    rows_per_mutation = rows_per_mutation[np.cumsum(rows_per_mutation) <= n_rows]
+    n_mutations = len(rows_per_mutation)
+    mutation = np.repeat(np.arange(n_mutations), rows_per_mutation)
+    n = len(mutation)
+
+    weights = arrondissements["weight"].to_numpy()
+    arr_index = rng.choice(len(arrondissements), size=n_mutations, p=weights / weights.sum())[mutation]
+    type_local = _choice(rng, TYPE_LOCAL, n)
+    is_logement = np.isin(type_local, ["Appartement", "Maison"])
+    rooms = np.where(is_logement, _choice(rng, ROOMS, n).astype(float), np.nan)
+    surface = np.where(
+        type_local == "Dépendance",
+        np.nan,
+        np.round(rng.lognormal(np.log(18 + 20 * np.nan_to_num(rooms, nan=1.5)), 0.3, n)),
+    )
+    prix_m2 = arrondissements["prix_m2_median"].to_numpy()[arr_index] * rng.lognormal(0, 0.25, n)
+    valeur = np.round(np.nan_to_num(surface, nan=15) * prix_m2, -2)
+    valeur = np.maximum.reduceat(valeur, np.r_[0, np.cumsum(rows_per_mutation)[:-1]])[mutation]
+    day = rng.integers(0, 365, n_mutations)[mutation]
+
+    df = pd.DataFrame({
+        "id_mutation": pd.Series(first_mutation + mutation).astype(str).radd(f"{year}-"),
+        "date_mutation": (pd.Timestamp(f"{year}-01-01") + pd.to_timedelta(day, unit="D")).strftime("%Y-%m-%d"),
+        "numero_disposition": 1,
+        "nature_mutation": _choice(rng, NATURE_MUTATION, n_mutations)[mutation],
+        "valeur_fonciere": valeur,
+        "adresse_numero": rng.integers(1, 200, n),
+        "adresse_nom_voie": "RUE DE RIVOLI",
+        "code_postal": arrondissements["code_commune"].to_numpy()[arr_index] - 75100 + 75000,
+        "code_commune": arrondissements["code_commune"].to_numpy()[arr_index],
+        "nom_commune": "Paris",
+        "code_departement": 75,
+        "nombre_lots": rng.integers(0, 4, n),
+        "code_type_local": pd.Series(type_local).map(CODE_TYPE_LOCAL).astype("Int64"),
+        "type_local": type_local,
+        "surface_reelle_bati": surface,
+        "nombre_pieces_principales": rooms,
+        "surface_terrain": np.nan,
+        "longitude": arrondissements["lon"].to_numpy()[arr_index] + rng.normal(0, 0.008, n),
+        "latitude": arrondissements["lat"].to_numpy()[arr_index] + rng.normal(0, 0.005, n),
+    })
+    duplicates = df.sample(frac=DUPLICATE_RATE, random_state=int(rng.integers(1 << 31)))
+    return pd.concat([df, duplicates]).sort_index(kind="stable", ignore_index=True)
+
+
+def generate_bronze(output_dir: Path, n_rows: int, years=YEARS, seed: int = 0) -> dict:
+    """
+    Write synthetic dvf_75_{year}.csv files totalling about n_rows rows, spread evenly over the years.
+    Args:
+        output_dir (Path): Directory of the bronze files.
+        n_rows (int): Total number of rows.
+        years (Iterable[int]): Years to generate.
+        seed (int): Random seed, the same seed always generates the same files.
+    Returns:
+        dict: {year: number of rows written}.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    arrondissements = load_arrondissements()
+    years = list(years)
+    rows_written = {}
+    for year in years:
+        remaining = n_rows // len(years)
+        first_mutation = 0
+        rows_written[year] = 0
+        with open(output_dir / f"dvf_75_{year}.csv", "w", encoding="utf-8", newline="") as f:
+            while remaining > 0:
+                chunk = generate_chunk(rng, min(CHUNK_ROWS, remaining), year, first_mutation, arrondissements)
+                chunk.to_csv(f, index=False, header=(first_mutation == 0))
+                first_mutation += int(chunk["id_mutation"].nunique())
+                remaining -= len(chunk)
+                rows_written[year] += len(chunk)
+    return rows_written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic DVF bronze files.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="total number of rows (100k to 50M)")
+    parser.add_argument("--output-dir", type=Path, required=True, help="directory of the generated dvf_75_{year}.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_bronze(args.output_dir, args.rows, seed=args.seed))
@@ -6,29 +6,122 @@ It prepares ready-to-use datasets for building API endpoints.
 import pandas as pd
 from pathlib import Path
 
+from cube import build_leaf_sketches, build_rollup_cube, leaves_from_cube, query_cube, renumber_leaves
+from instrumentation import StageRecorder, metrics_path_from_env
+from manifest import GROUP_KEYS, MANIFEST_PATH, load_manifest, save_manifest
+from sketch import DEFAULT_COMPRESSION, quantiles
+from storage import delete_partitions, read_partitioned, save_partitioned
+
 ROOT = Path(__file__).resolve().parents[1]
+SILVER_DIR = ROOT / "data" / "silver_layer"
+GOLD_DIR = ROOT / "data" / "gold_layer"
+
+AGG_KEYS = ["code_commune", "annee", "type_local", "nombre_pieces_principales"]
+SILVER_COLUMNS = ["id_mutation", "code_commune", "annee", "type_local", "nombre_pieces_principales", "prix_m2"]
+
+CUBE_FILE = "agg_dvf_cube.csv"
+CUBE_CENTROIDS_FILE = "agg_dvf_cube_centroids.csv"
 
 
-def read_cleaned_csv_files(file_name: str) -> pd.DataFrame:
+def _apply_filters(df: pd.DataFrame, filters: dict | None) -> pd.DataFrame:
     """
-    Read csv files from silver layer
+    Keep rows matching {column: value} or {column: [values]} filters.
+    """
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set, range)):
+            mask &= df[column].isin(list(value))
+        else:
+            mask &= df[column] == value
+    return df[mask]
+
+
+def read_cleaned_csv_files(
+    file_name: str,
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
     """
-    file_path = ROOT / "data" / "silver_layer" / file_name
+    Read csv files from silver layer.
+    CSV files must be parsed entirely, only the requested columns are kept and filters are applied after parsing.
+    Use read_cleaned_dataset on a Parquet dataset to read only the matching partitions.
+
+    Args:
+        file_name (str): Name of the CSV file in the silver layer.
+        columns (list[str] | None): Columns to read, all columns if None.
+        filters (dict | None): {column: value} or {column: [values]} filters, e.g. {"annee": 2023}.
+    Returns:
+        pd.DataFrame: Cleaned dataframe.
+    """
+    file_path = SILVER_DIR / file_name
     if not file_path.exists():
         raise FileNotFoundError(file_path)
-    return pd.read_csv(file_path, sep=";", encoding="utf-8", header=0)
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(columns + list(filters or {})))
+    df = pd.read_csv(file_path, sep=";", encoding="utf-8", header=0, usecols=usecols)
+    df = _apply_filters(df, filters)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def read_cleaned_dataset(
+    dataset_name: str,
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Read a Parquet dataset from silver layer, partitioned by annee and code_commune.
+    Only the partitions matching the filters and the requested columns are read, e.g.
+    read_cleaned_dataset("cleaned_dvf_data", ["prix_m2"], {"annee": 2023, "code_commune": 75101}).
+
+    Args:
+        dataset_name (str): Name of the dataset directory in the silver layer.
+        columns (list[str] | None): Columns to read, all columns if None.
+        filters (dict | None): {column: value} or {column: [values]} filters.
+    Returns:
+        pd.DataFrame: Cleaned dataframe.
+    """
+    return read_partitioned(SILVER_DIR / dataset_name, columns, filters)
 
 
-def agg_dvf_by_arr_year(df: pd.DataFrame) -> pd.DataFrame:
+def agg_dvf_by_arr_year(
+    df: pd.DataFrame,
+    method: str = "exact",
+    compression: float = DEFAULT_COMPRESSION,
+) -> pd.DataFrame:
     """
     Aggregate DVF data by arrondissement and year, calculating median price per square meter and total number of sale transactions.
+    The "exact" method computes the exact median; the "sketch" method estimates it from t-digest sketches,
+    as stored in the rollup cube, and is mainly used to validate the sketches against the exact median.
     
     Args:
         df (pd.DataFrame): cleaned DVF dataframe.
+        method (str): "exact" or "sketch".
+        compression (float): t-digest compression of the "sketch" method, see etl/sketch.py.
     Returns:
         pd.DataFrame: Aggregated DVF dataframe by arrondissement and year.
     """
-    agg_df = df.groupby(["code_commune", "annee", "type_local", "nombre_pieces_principales"]).agg(
+    if method == "sketch":
+        leaves, centroids = build_leaf_sketches(df, AGG_KEYS, compression=compression)
+        leaves["prix_m2_med"] = quantiles(
+            centroids["cell_id"].to_numpy(),
+            centroids["mean"].to_numpy(),
+            centroids["weight"].to_numpy(),
+            leaves["prix_m2_min"].to_numpy(),
+            leaves["prix_m2_max"].to_numpy(),
+            0.5,
+        )
+        # like the exact groupby, ignore groups with a missing key
+        leaves = leaves.dropna(subset=AGG_KEYS)
+        return leaves[AGG_KEYS + ["prix_m2_med", "nb_ventes"]].reset_index(drop=True)
+    if method != "exact":
+        raise ValueError(f"Unknown method {method!r}, expected 'exact' or 'sketch'")
+
+    agg_df = df.groupby(AGG_KEYS).agg(
         prix_m2_med=("prix_m2", "median"),
         nb_ventes=("id_mutation", "count")
     ).reset_index()
@@ -36,26 +129,299 @@ def agg_dvf_by_arr_year(df: pd.DataFrame) -> pd.DataFrame:
     return agg_df    
 
 
-def save_to_gold(df: pd.DataFrame, output_path: Path) -> None:
+def save_to_gold(df: pd.DataFrame, output_path: Path, storage: str = "csv") -> None:
     """
-    Save the aggregated DVF dataframe to a CSV file in the gold layer (data/gold_layer/).
+    Save the aggregated DVF dataframe to the gold layer (data/gold_layer/),
+    either as a CSV file or as a Parquet dataset partitioned by annee and code_commune.
     
     Args:
         df (pd.DataFrame): Aggregated DVF dataframe.
-        output_path (Path): Path to save the aggregated DVF CSV file.
+        output_path (Path): Path to save the aggregated DVF CSV file or Parquet dataset directory.
+        storage (str): "csv" or "parquet".
     Returns:
         None.
     """    
+    if storage == "parquet":
+        save_partitioned(df, output_path)
+        return
     output_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False, header=True, sep=";", encoding="utf-8")
 
 
-def main(): 
-    dvf_data_file = "cleaned_dvf_data.csv"
-    dvf_data = read_cleaned_csv_files(dvf_data_file)
-    agg_df = agg_dvf_by_arr_year(dvf_data)
-    output_path = Path(f"{ROOT}/data/gold_layer/agg_dvf_data.csv")
-    save_to_gold(agg_df, output_path)
+def build_dvf_cube(
+    df: pd.DataFrame,
+    compression: float = DEFAULT_COMPRESSION,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Build the rollup cube of price per square meter over every subset of
+    (code_commune, annee, type_local, nombre_pieces_principales), see etl/cube.py.
+
+    Args:
+        df (pd.DataFrame): cleaned DVF dataframe.
+        compression (float): t-digest compression, see etl/sketch.py.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Cube cells and their sketch centroids.
+    """
+    leaves, centroids = build_leaf_sketches(df, AGG_KEYS, compression=compression)
+    return build_rollup_cube(leaves, centroids, AGG_KEYS, compression=compression)
+
+
+def update_dvf_cube(
+    df: pd.DataFrame,
+    groups: list[tuple],
+    compression: float = DEFAULT_COMPRESSION,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Replace the leaf cells of the given (code_commune, annee) groups in the existing cube by sketches of `df`,
+    then merge the rollup cells again from the leaves.
+
+    Args:
+        df (pd.DataFrame): cleaned DVF data of the changed groups.
+        groups (list[tuple]): (code_commune, annee) groups changed or removed since the cube was built.
+        compression (float): t-digest compression, see etl/sketch.py.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Cube cells and their sketch centroids.
+    """
+    old_leaves, old_centroids = leaves_from_cube(*read_dvf_cube(), AGG_KEYS)
+    kept = ~_select_groups(old_leaves, groups)
+    old_centroids = old_centroids[old_centroids["cell_id"].isin(old_leaves.loc[kept, "cell_id"])]
+    old_leaves = old_leaves[kept]
+
+    new_leaves, new_centroids = build_leaf_sketches(df, AGG_KEYS, compression=compression)
+    offset = len(kept)
+    new_leaves["cell_id"] += offset
+    new_centroids["cell_id"] += offset
+
+    leaves, centroids = renumber_leaves(
+        pd.concat([old_leaves, new_leaves], ignore_index=True),
+        pd.concat([old_centroids, new_centroids], ignore_index=True),
+        AGG_KEYS,
+    )
+    return build_rollup_cube(leaves, centroids, AGG_KEYS, compression=compression)
+
+
+def save_dvf_cube(cube: pd.DataFrame, centroids: pd.DataFrame) -> None:
+    """
+    Save the rollup cube and its sketch centroids to CSV files in the gold layer.
+    """
+    cube = cube.copy()
+    for column in ["code_commune", "annee"]:
+        if pd.api.types.is_numeric_dtype(cube[column]):
+            cube[column] = cube[column].astype("Int64")
+    save_to_gold(cube, GOLD_DIR / CUBE_FILE)
+    save_to_gold(centroids, GOLD_DIR / CUBE_CENTROIDS_FILE)
+
+
+def read_dvf_cube() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Read the rollup cube and its sketch centroids from the gold layer.
+    """
+    cube_path, centroids_path = GOLD_DIR / CUBE_FILE, GOLD_DIR / CUBE_CENTROIDS_FILE
+    for file_path in (cube_path, centroids_path):
+        if not file_path.exists():
+            raise FileNotFoundError(file_path)
+    cube = pd.read_csv(
+        cube_path,
+        sep=";",
+        encoding="utf-8",
+        header=0,
+        float_precision="round_trip",
+        dtype={"code_commune": "Int64", "annee": "Int64"},
+    )
+    centroids = pd.read_csv(centroids_path, sep=";", encoding="utf-8", header=0, float_precision="round_trip")
+    return cube, centroids
+
+
+def query_dvf_cube(filters: dict, q: float | None = None) -> pd.DataFrame:
+    """
+    Answer a price query at any granularity from the gold rollup cube, without reading the silver layer, e.g.
+    query_dvf_cube({"annee": 2023}) for all of Paris in 2023, or
+    query_dvf_cube({"code_commune": 75111, "type_local": "Appartement"}, q=0.95) for the 95th percentile.
+
+    Args:
+        filters (dict): {key: value} or {key: [values]} filters on AGG_KEYS, the other keys are rolled up.
+        q (float | None): Additional quantile to compute from the sketches, between 0 and 1.
+    Returns:
+        pd.DataFrame: Matching cube cells with nb_ventes, min, p10, p25, p50, p75, p90 and max of prix_m2.
+    """
+    cube, centroids = read_dvf_cube()
+    return query_cube(cube, centroids, AGG_KEYS, filters, q)
+
+
+def read_silver_dvf_data(storage: str = "csv", filters: dict | None = None) -> pd.DataFrame:
+    """
+    Read the columns of the cleaned DVF data needed for aggregation, from the CSV file or the Parquet dataset.
+    """
+    if storage == "parquet":
+        return read_cleaned_dataset("cleaned_dvf_data", SILVER_COLUMNS, filters)
+    return read_cleaned_csv_files("cleaned_dvf_data.csv", SILVER_COLUMNS, filters)
+
+
+def _select_groups(df: pd.DataFrame, groups: list[tuple]) -> pd.Series:
+    """
+    Return a boolean mask of the rows belonging to the given (code_commune, annee) groups.
+    """
+    return pd.MultiIndex.from_frame(df[GROUP_KEYS]).isin(groups)
+
+
+def update_gold_incrementally(
+    storage: str = "csv",
+    export_csv: bool = True,
+    manifest_path: Path = MANIFEST_PATH,
+    build_cube: bool = True,
+) -> list[tuple]:
+    """
+    Re-aggregate only the (code_commune, annee) groups whose silver rows changed since the gold layer was built,
+    and merge them into the existing gold output. Requires the silver layer to be built with clean.main(incremental=True).
+    Falls back to a full rebuild when the gold output is missing or was written with another storage format.
+
+    Args:
+        storage (str): "csv" or "parquet".
+        export_csv (bool): With Parquet storage, also write the gold CSV export.
+        manifest_path (Path): Path of the manifest file.
+        build_cube (bool): Also update the rollup cube, from its leaf cells and the changed groups only.
+    Returns:
+        list[tuple]: (code_commune, annee) groups that were re-aggregated or removed.
+    """
+    manifest = load_manifest(manifest_path)
+    silver_entry = manifest["silver"].get("cleaned_dvf_data")
+    if silver_entry is None or silver_entry.get("storage") != storage:
+        raise ValueError(f"No {storage} silver layer in the manifest, run clean.main(incremental=True) first")
+    silver_groups = _silver_groups(silver_entry)
+
+    gold_entry = manifest["gold"].get("agg_dvf_data", {})
+    gold_path = GOLD_DIR / ("agg_dvf_data" if storage == "parquet" else "agg_dvf_data.csv")
+    full_rebuild = not gold_path.exists() or gold_entry.get("storage") != storage
+    gold_groups = {} if full_rebuild else {
+        (code_commune, annee): digest for code_commune, annee, digest in gold_entry.get("groups", [])
+    }
+    changed = [group for group, digest in silver_groups.items() if gold_groups.get(group) != digest]
+    removed = [group for group in gold_groups if group not in silver_groups]
+    if not changed and not removed:
+        return []
+
+    cube_exists = (GOLD_DIR / CUBE_FILE).exists() and (GOLD_DIR / CUBE_CENTROIDS_FILE).exists()
+    if full_rebuild or (build_cube and not cube_exists):
+        silver = read_silver_dvf_data(storage)
+        if build_cube:
+            save_dvf_cube(*build_dvf_cube(silver))
+
+    if full_rebuild:
+        agg_df = agg_dvf_by_arr_year(silver)
+        save_to_gold(agg_df, gold_path, storage)
+    else:
+        new_agg = None
+        if changed:
+            filters = {
+                "code_commune": sorted({code_commune for code_commune, _ in changed}),
+                "annee": sorted({annee for _, annee in changed}),
+            }
+            silver = read_silver_dvf_data(storage, filters)
+            silver = silver[_select_groups(silver, changed)]
+            new_agg = agg_dvf_by_arr_year(silver)
+        else:
+            silver = pd.DataFrame(columns=SILVER_COLUMNS)
+        if build_cube and cube_exists:
+            save_dvf_cube(*update_dvf_cube(silver, changed + removed))
+        if storage == "parquet":
+            delete_partitions(gold_path, [(annee, code_commune) for code_commune, annee in changed + removed])
+            if new_agg is not None:
+                save_partitioned(new_agg, gold_path, mode="partitions")
+            agg_df = read_partitioned(gold_path, AGG_KEYS + ["prix_m2_med", "nb_ventes"]) if export_csv else None
+        else:
+            existing = pd.read_csv(gold_path, sep=";", encoding="utf-8", header=0, float_precision="round_trip")
+            existing = existing[~_select_groups(existing, changed + removed)]
+            agg_df = pd.concat([existing, new_agg], ignore_index=True)
+            save_to_gold(agg_df.sort_values(AGG_KEYS, ignore_index=True), gold_path, storage)
+
+    if storage == "parquet" and export_csv:
+        save_to_gold(agg_df.sort_values(AGG_KEYS, ignore_index=True), GOLD_DIR / "agg_dvf_data.csv")
+
+    manifest["gold"]["agg_dvf_data"] = _gold_manifest_entry(storage, silver_groups)
+    save_manifest(manifest, manifest_path)
+    return changed + removed
+
+
+def _silver_groups(silver_entry: dict) -> dict:
+    """
+    Return the {(code_commune, annee): hash} groups of the silver entry of the manifest.
+    """
+    return {
+        (code_commune, annee): digest
+        for year in silver_entry["years"].values()
+        for code_commune, annee, digest in year["groups"]
+    }
+
+
+def _gold_manifest_entry(storage: str, silver_groups: dict) -> dict:
+    return {
+        "storage": storage,
+        "groups": [[code_commune, annee, digest] for (code_commune, annee), digest in sorted(silver_groups.items())],
+    }
+
+
+def record_gold_manifest(storage: str = "csv", manifest_path: Path = MANIFEST_PATH) -> None:
+    """
+    Record a full gold rebuild in the manifest. When the silver entry describes the silver layer that was read,
+    gold is recorded as aggregated from its groups; otherwise the gold entry is dropped, so that the next incremental
+    run rebuilds gold from scratch.
+    Args:
+        storage (str): "csv" or "parquet".
+        manifest_path (Path): Path of the manifest file.
+    Returns:
+        None.
+    """
+    manifest = load_manifest(manifest_path)
+    silver_entry = manifest["silver"].get("cleaned_dvf_data")
+    if silver_entry is not None and silver_entry.get("storage") == storage:
+        manifest["gold"]["agg_dvf_data"] = _gold_manifest_entry(storage, _silver_groups(silver_entry))
+    elif "agg_dvf_data" in manifest["gold"]:
+        manifest["gold"].pop("agg_dvf_data")
+    else:
+        return
+    save_manifest(manifest, manifest_path)
+
+
+def main(
+    storage: str = "csv",
+    export_csv: bool = True,
+    incremental: bool = False,
+    build_cube: bool = True,
+    metrics_path: Path | None = None,
+):
+    """
+    Aggregate the cleaned DVF data of the silver layer into the gold layer.
+    With storage="parquet", silver is read from the partitioned dataset and gold is written as a partitioned
+    dataset too; the gold CSV export is still written unless export_csv is False.
+    With incremental=True, only the groups changed since the last run are re-aggregated (see update_gold_incrementally).
+    With build_cube=True, the rollup cube of price percentiles is written next to the exact aggregates.
+    With metrics_path (or the ETL_METRICS_PATH environment variable), per-stage metrics are appended to it as JSON.
+    """
+    recorder = StageRecorder("aggregate")
+    if incremental:
+        with recorder.stage("update_gold_incrementally") as metrics:
+            metrics["changed_groups"] = len(update_gold_incrementally(storage, export_csv, build_cube=build_cube))
+        recorder.save(metrics_path_from_env(metrics_path))
+        return
+    with recorder.stage("read_silver_dvf_data") as metrics:
+        dvf_data = read_silver_dvf_data(storage)
+        metrics["rows_out"] = len(dvf_data)
+    with recorder.stage("agg_dvf_by_arr_year", rows_in=len(dvf_data)) as metrics:
+        agg_df = agg_dvf_by_arr_year(dvf_data)
+        metrics["rows_out"] = len(agg_df)
+    if build_cube:
+        with recorder.stage("build_dvf_cube", rows_in=len(dvf_data)) as metrics:
+            cube, centroids = build_dvf_cube(dvf_data)
+            save_dvf_cube(cube, centroids)
+            metrics["rows_out"] = len(cube)
+    with recorder.stage("save_to_gold", rows_in=len(agg_df)) as metrics:
+        if storage == "parquet":
+            save_to_gold(agg_df, GOLD_DIR / "agg_dvf_data", storage)
+        if storage == "csv" or export_csv:
+            save_to_gold(agg_df, GOLD_DIR / "agg_dvf_data.csv")
+        metrics["rows_out"] = len(agg_df)
+    record_gold_manifest(storage)
+    recorder.save(metrics_path_from_env(metrics_path))
 
 
 if __name__ == "__main__":
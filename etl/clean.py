@@ -7,106 +7,574 @@ Data sources include CSV files (data/bronze_layer/*.csv):
 * Public transport data - RATP open data (data.ratp.fr) containing information about public transport in Paris, France.
 """
 
-import pandas as pd
+import json
+import os
+import shutil
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from functools import partial
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+from instrumentation import StageRecorder, metrics_path_from_env
+from manifest import MANIFEST_PATH, drop_manifest_entries, file_fingerprint, group_hashes, load_manifest, save_manifest
+from rules import evaluate_rules, merge_reports
+from scheduler import DEFAULT_WORKERS, run_pipeline
+from storage import delete_partitions, save_partitioned
+
 ROOT = Path(__file__).resolve().parents[1]
+BRONZE_DIR = ROOT / "data" / "bronze_layer"
+SILVER_DIR = ROOT / "data" / "silver_layer"
+
+# silver layer storage formats: "csv" (single export file) or "parquet" (dataset partitioned by annee/code_commune)
+STORAGE_FORMATS = ("csv", "parquet")
+
+DVF_YEARS = range(2020, 2026)
+
+# number of bronze rows held in memory at once in streaming mode
+DEFAULT_CHUNKSIZE = 250_000
+
+NATURE_MUTATION_DTYPE = pd.CategoricalDtype([
+    "Vente",
+    "Vente en l'état futur d'achèvement",
+    "Vente terrain à bâtir",
+    "Adjudication",
+    "Echange",
+    "Expropriation",
+])
 
+TYPE_LOCAL_DTYPE = pd.CategoricalDtype([
+    "Appartement",
+    "Maison",
+    "Dépendance",
+    "Local industriel. commercial ou assimilé",
+])
 
-def read_dvf_data() -> pd.DataFrame:
+# columns read from bronze files in streaming mode, with compact dtypes
+# valeur_fonciere stays float64: float32 cannot represent prices above ~16M€ exactly
+DVF_DTYPES = {
+    "id_mutation": "str",
+    "nature_mutation": NATURE_MUTATION_DTYPE,
+    "valeur_fonciere": "float64",
+    "code_commune": "category",
+    "type_local": TYPE_LOCAL_DTYPE,
+    "surface_reelle_bati": "float32",
+    "nombre_pieces_principales": "float32",
+}
+
+# hash of all the bronze columns of a row, added to streamed chunks so that duplicates are detected on whole bronze rows
+# like in the in-memory path, while only the DVF_DTYPES columns are kept
+ROW_HASH_COLUMN = "row_hash"
+
+# silver layer columns, prix_m2 being computed during cleaning
+DVF_SILVER_COLUMNS = [
+    "id_mutation",
+    "code_commune",
+    "annee",
+    "valeur_fonciere",
+    "type_local",
+    "surface_reelle_bati",
+    "nombre_pieces_principales",
+    "prix_m2",
+]
+
+# cleaning rules applied to raw DVF data, see etl/rules.py
+DVF_CLEANING_RULES = [
+    # keep only sales : "Vente"
+    {"name": "nature_mutation_vente", "kind": "isin", "column": "nature_mutation", "values": ["Vente"]},
+    # drop rows with missing code_commune, valeur_fonciere, type_local, surface_reelle_bati
+    {
+        "name": "champs_obligatoires",
+        "kind": "notna",
+        "columns": ["code_commune", "valeur_fonciere", "type_local", "surface_reelle_bati"],
+    },
+    # keep only "Appartement" and "Maison"
+    {"name": "type_local_logement", "kind": "isin", "column": "type_local", "values": ["Appartement", "Maison"]},
+    # exclude "Maison" with surface <10 m2 or > 300 m2, and "Appartement" with surface > 200 m2
+    {
+        "name": "surface_par_type_local",
+        "kind": "bounds_by",
+        "column": "surface_reelle_bati",
+        "by": "type_local",
+        "bounds": {"Maison": (10, 300), "Appartement": (None, 200)},
+    },
+    # exclude housing with more than 8 principle rooms
+    {"name": "nombre_pieces_max", "kind": "max", "column": "nombre_pieces_principales", "value": 8},
+    # exclude housing with value valeur_fonciere <= 2€
+    {"name": "valeur_fonciere_min", "kind": "greater_than", "column": "valeur_fonciere", "value": 2},
+    # drop duplicates
+    {"name": "doublons", "kind": "unique"},
+]
+
+
+def dvf_file_path(year: int, bronze_dir: Path = BRONZE_DIR) -> Path:
+    """
+    Return the path of the DVF CSV file for a given year, checking that it exists.
+    Args:
+        year (int): Year of the DVF file.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+    Returns:
+        Path: Path to the DVF CSV file.
+    """
+    file_path = bronze_dir / f"dvf_75_{year}.csv"
+    if not file_path.exists():
+        raise FileNotFoundError(file_path)
+    return file_path
+
+
+def read_dvf_data(years: Iterable[int] = DVF_YEARS, bronze_dir: Path = BRONZE_DIR) -> pd.DataFrame:
     """
     Read DVF data from CSV files for the years 2020 to 2025 and concatenate them into a single dataframe.
     Args:
-        None.
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        bronze_dir (Path): Directory containing the bronze DVF files.
     Returns:
         pd.DataFrame: Concatenated DVF dataframe for the years 2020 to 2025.
     """
     df_list = []
-    for year in range(2020, 2026):
-        file_path = ROOT / "data" / "bronze_layer" / f"dvf_75_{year}.csv"
-        if not file_path.exists():
-            raise FileNotFoundError(file_path)
+    for year in years:
+        file_path = dvf_file_path(year, bronze_dir)
         df = pd.read_csv(file_path, sep=",", encoding="utf-8", header=0)
         df["annee"] = year
         df_list.append(df)
     return pd.concat(df_list, ignore_index=True)
 
 
-def clean_dvf_data(df: pd.DataFrame) -> pd.DataFrame:
+def read_dvf_year(year: int, bronze_dir: Path = BRONZE_DIR) -> pd.DataFrame:
     """
-    Preprocess raw DVF data by selecting relevant columns and filtering rows based on specific criteria.
+    Read the DVF data of a single year, the unit of work of the parallel pipeline.
+    Args:
+        year (int): Year to read.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+    Returns:
+        pd.DataFrame: DVF dataframe of the year.
+    """
+    return read_dvf_data([year], bronze_dir)
+
+
+def iter_dvf_chunks(
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    years: Iterable[int] = DVF_YEARS,
+    bronze_dir: Path = BRONZE_DIR,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream DVF data year by year in chunks of at most `chunksize` rows.
+    The columns listed in DVF_DTYPES are parsed with compact dtypes, and the other columns as strings: they are only
+    used to compute the row_hash column, then dropped.
+    Args:
+        chunksize (int): Maximum number of rows per chunk.
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+    Returns:
+        Iterator[pd.DataFrame]: Raw DVF chunks with the DVF_DTYPES columns, an "annee" column and a row_hash column.
+    """
+    # resolve every file first so a missing year fails before anything is read
+    file_paths = {year: dvf_file_path(year, bronze_dir) for year in years}
+    for year, file_path in file_paths.items():
+        reader = pd.read_csv(
+            file_path,
+            sep=",",
+            encoding="utf-8",
+            header=0,
+            dtype=defaultdict(lambda: "str", DVF_DTYPES),
+            chunksize=chunksize,
+        )
+        with reader:
+            for chunk in reader:
+                row_hash = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+                chunk = chunk[list(DVF_DTYPES)]
+                chunk["annee"] = np.int16(year)
+                chunk[ROW_HASH_COLUMN] = row_hash
+                yield chunk
+
+
+def clean_dvf_data_with_report(
+    df: pd.DataFrame,
+    rules: list[dict] = DVF_CLEANING_RULES,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Preprocess raw DVF data by selecting relevant columns and filtering rows based on a declarative rule set.
+    All rules are combined into a single mask and the selected rows are materialized once.
     Args:
         df (pd.DataFrame): Raw DVF dataframe.
+        rules (list[dict]): Cleaning rules, see etl/rules.py.
     Returns:
-        pd.DataFrame: Cleaned DVF dataframe.
+        tuple[pd.DataFrame, dict]: Cleaned DVF dataframe, and the number of rows rejected by each rule.
     """
+    mask, report = evaluate_rules(df, rules)
+    return _select_silver_rows(df, mask), report
 
-    # columns to keep
-    columns_to_keep = [
-        "id_mutation",
-        "code_commune",
-        "annee",
-        "valeur_fonciere",
-        "type_local",
-        "surface_reelle_bati",
-        "nombre_pieces_principales",
-        "prix_m2"
-    ]
 
-    # filter nature_mutation to keep only sales : "Vente" 
-    df = df[df["nature_mutation"] == "Vente"]
+def _select_silver_rows(df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+    """
+    Keep the rows of a mask and the relevant columns, and calculate price per square meter.
+    """
+    cleaned = df.loc[mask, DVF_SILVER_COLUMNS[:-1]]
+    cleaned.insert(
+        len(cleaned.columns),
+        "prix_m2",
+        cleaned["valeur_fonciere"].to_numpy() / cleaned["surface_reelle_bati"].to_numpy(),
+    )
+    return cleaned
 
-    # drop duplicates
-    df = df.drop_duplicates()
 
-    # drop rows with missing code_commune, valeur_fonciere, type_local, surface_reelle_bati
-    df = df.dropna(subset=["code_commune", "valeur_fonciere", "type_local", "surface_reelle_bati"])
+def clean_dvf_data(
+    df: pd.DataFrame,
+    rules: list[dict] = DVF_CLEANING_RULES,
+    report: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Preprocess raw DVF data by selecting relevant columns and filtering rows based on specific criteria.
+    Args:
+        df (pd.DataFrame): Raw DVF dataframe.
+        rules (list[dict]): Cleaning rules, see etl/rules.py.
+        report (dict | None): If given, the rejection counts of this call are added to it.
+    Returns:
+        pd.DataFrame: Cleaned DVF dataframe.
+    """
+    cleaned, call_report = clean_dvf_data_with_report(df, rules)
+    if report is not None:
+        report.update(merge_reports([report, call_report]))
+    return cleaned
 
-    # filter type_local to keep only "Appartement" and "Maison"
-    df = df[df["type_local"].isin(["Appartement", "Maison"])]
 
-    # drop rows with missing or zero values in "valeur_fonciere" or "surface_reelle_bati"
-    df = df.dropna(subset=["valeur_fonciere", "surface_reelle_bati"])
+def clean_dvf_chunk(
+    chunk: pd.DataFrame,
+    seen_hashes: np.ndarray,
+    rules: list[dict] = DVF_CLEANING_RULES,
+) -> tuple[pd.DataFrame, dict, np.ndarray]:
+    """
+    Clean a streamed chunk, also rejecting the duplicates of rows kept from the previous chunks of the same year.
+    Args:
+        chunk (pd.DataFrame): Raw DVF chunk with a row_hash column, as yielded by iter_dvf_chunks.
+        seen_hashes (np.ndarray): Sorted row hashes of the rows kept from the previous chunks of the year.
+        rules (list[dict]): Cleaning rules, see etl/rules.py.
+    Returns:
+        tuple[pd.DataFrame, dict, np.ndarray]: Cleaned chunk, its cleaning report, and the updated sorted row hashes.
+    """
+    mask, report = evaluate_rules(chunk, rules)
+    unique_rules = [rule["name"] for rule in rules if rule["kind"] == "unique"]
+    if unique_rules:
+        kept = np.flatnonzero(mask)
+        hashes = chunk[ROW_HASH_COLUMN].to_numpy()[kept]
+        positions = np.minimum(np.searchsorted(seen_hashes, hashes), max(len(seen_hashes) - 1, 0))
+        duplicated = seen_hashes[positions] == hashes if len(seen_hashes) else np.zeros(len(kept), dtype=bool)
+        mask[kept[duplicated]] = False
+        n_duplicated = int(np.count_nonzero(duplicated))
+        report["rejected"][unique_rules[-1]] += n_duplicated
+        report["rows_out"] -= n_duplicated
+        # both arrays are sorted, so the stable sort (timsort) merges them in linear time
+        seen_hashes = np.sort(np.concatenate([seen_hashes, np.sort(hashes[~duplicated])]), kind="stable")
+    return _select_silver_rows(chunk, mask), report, seen_hashes
 
-    # exclude "Maison" with surface <10 m2 or > 300 m2 , and "Appartement" with surface > 200 m2
-    df = df[~((df["type_local"] == "Maison") & (df["surface_reelle_bati"] < 10))]
-    df = df[~((df["type_local"] == "Maison") & (df["surface_reelle_bati"] > 300))]
-    df = df[~((df["type_local"] == "Appartement") & (df["surface_reelle_bati"] > 200))]
 
-    # exclude housing with more than 8 principle rooms
-    df = df[~(df["nombre_pieces_principales"] > 8)]
+def _iter_clean_chunks(
+    chunksize: int,
+    years: Iterable[int],
+    bronze_dir: Path,
+    report: dict,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream cleaned DVF chunks, adding their rejection counts to `report`.
+    """
+    seen_year, seen_hashes = None, np.empty(0, dtype=np.uint64)
+    for chunk in iter_dvf_chunks(chunksize, years, bronze_dir):
+        year = int(chunk["annee"].iat[0]) if len(chunk) else seen_year
+        if year != seen_year:
+            # duplicated rows share their annee, so the hashes of the previous year are no longer needed
+            seen_year, seen_hashes = year, np.empty(0, dtype=np.uint64)
+        cleaned, call_report, seen_hashes = clean_dvf_chunk(chunk, seen_hashes)
+        report.update(merge_reports([report, call_report]))
+        yield cleaned
 
-    # exclude housing with value valeur_fonciere <= 2€
-    df = df[~(df["valeur_fonciere"] <= 2)]
 
-    # calculate price per square meter
-    df["prix_m2"] = df["valeur_fonciere"] / df["surface_reelle_bati"]
+def save_cleaning_report(report: dict, output_path: Path) -> None:
+    """
+    Save the rejection counts of a cleaning run next to the silver data, as JSON.
+    Args:
+        report (dict): Report returned by clean_dvf_data_with_report.
+        output_path (Path): Path of the JSON report.
+    Returns:
+        None.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
 
-    # keep only relevant columns
-    df = df[columns_to_keep]
 
-    return df
+def silver_output_path(name: str, storage: str = "csv") -> Path:
+    """
+    Return the silver layer location of a dataset: a CSV file or a partitioned Parquet directory.
+    Args:
+        name (str): Dataset name, e.g. "cleaned_dvf_data".
+        storage (str): "csv" or "parquet".
+    Returns:
+        Path: Path of the dataset in the silver layer.
+    """
+    if storage not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage {storage!r}, expected one of {STORAGE_FORMATS}")
+    return SILVER_DIR / (f"{name}.csv" if storage == "csv" else name)
 
 
-def save_to_silver(df: pd.DataFrame, output_path: Path) -> None:
+def save_to_silver(df: pd.DataFrame, output_path: Path, storage: str = "csv") -> None:
     """
-    Save the cleaned DVF dataframe to a CSV file in the silver layer (data/silver_layer/).
+    Save the cleaned DVF dataframe to the silver layer (data/silver_layer/),
+    either as a CSV file or as a Parquet dataset partitioned by annee and code_commune.
     
     Args:
         df (pd.DataFrame): Cleaned DVF dataframe.
-        output_path (Path): Path to save the cleaned DVF CSV file.
+        output_path (Path): Path to save the cleaned DVF CSV file or Parquet dataset directory.
+        storage (str): "csv" or "parquet".
     Returns:
         None.
     """    
+    if storage == "parquet":
+        save_partitioned(df, output_path)
+        return
     output_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False, header=True, sep=";", encoding="utf-8")
 
 
-def main(): 
-    dvf_data = read_dvf_data()
-    cleaned_dvf_data = clean_dvf_data(dvf_data)
-    output_path = Path(f"{ROOT}/data/silver_layer/cleaned_dvf_data.csv")
-    save_to_silver(cleaned_dvf_data, output_path)
+def write_silver_partitions(cleaned: tuple[pd.DataFrame, dict], output_path: Path) -> dict:
+    """
+    Write the partitions of a cleaned DVF dataframe to the silver Parquet dataset, the last stage of the parallel pipeline.
+    Args:
+        cleaned (tuple[pd.DataFrame, dict]): Cleaned DVF dataframe, usually a single year, and its cleaning report.
+        output_path (Path): Path of the Parquet dataset directory.
+    Returns:
+        dict: Cleaning report.
+    """
+    df, report = cleaned
+    save_partitioned(df, output_path, mode="partitions")
+    return report
+
+
+def clean_dvf_years(
+    years: Iterable[int] = DVF_YEARS,
+    workers: int = DEFAULT_WORKERS,
+    bronze_dir: Path = BRONZE_DIR,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Read and clean each year in a pool of `workers` processes, and concatenate the results in year order.
+    Args:
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        workers (int): Maximum number of worker processes, 1 runs serially.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+    Returns:
+        tuple[pd.DataFrame, dict]: Cleaned DVF dataframe, and the cleaning report of all years.
+    """
+    stages = [partial(read_dvf_year, bronze_dir=bronze_dir), clean_dvf_data_with_report]
+    results = run_pipeline(years, stages, workers)
+    cleaned = pd.concat([df for df, _ in results], ignore_index=True)
+    return cleaned, merge_reports([report for _, report in results])
+
+
+def invalidate_silver_manifest(manifest_path: Path = MANIFEST_PATH) -> None:
+    """
+    Drop the silver entry of the manifest before the silver layer is rewritten without recording its group hashes,
+    so that the next incremental run rebuilds it from scratch instead of merging into an output it does not describe.
+    The gold entry is kept: it lists the silver group hashes gold was aggregated from, which stay valid.
+    Args:
+        manifest_path (Path): Path of the manifest file.
+    Returns:
+        None.
+    """
+    drop_manifest_entries([("silver", "cleaned_dvf_data")], manifest_path)
+
+
+def build_silver(
+    output_path: Path,
+    storage: str = "csv",
+    workers: int = DEFAULT_WORKERS,
+    years: Iterable[int] = DVF_YEARS,
+    bronze_dir: Path = BRONZE_DIR,
+    manifest_path: Path = MANIFEST_PATH,
+) -> dict:
+    """
+    Rebuild the silver DVF data, each year going through read -> clean -> write partition in a process pool.
+    For Parquet, workers write their year partitions directly; for CSV, the cleaned years are concatenated in year order
+    and written once. Serial (workers=1) and parallel runs go through the same per-year path and produce identical files.
+
+    Args:
+        output_path (Path): Path to save the cleaned DVF CSV file or Parquet dataset directory.
+        storage (str): "csv" or "parquet".
+        workers (int): Maximum number of worker processes, 1 runs serially.
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+        manifest_path (Path): Path of the manifest file, whose silver entry is dropped (see invalidate_silver_manifest).
+    Returns:
+        dict: Cleaning report, rows_out being the number of rows written to the silver layer.
+    """
+    invalidate_silver_manifest(manifest_path)
+    if storage == "parquet":
+        if output_path.exists():
+            shutil.rmtree(output_path)
+        stages = [
+            partial(read_dvf_year, bronze_dir=bronze_dir),
+            clean_dvf_data_with_report,
+            partial(write_silver_partitions, output_path=output_path),
+        ]
+        return merge_reports(run_pipeline(years, stages, workers))
+    cleaned, report = clean_dvf_years(years, workers, bronze_dir)
+    save_to_silver(cleaned, output_path, storage)
+    return report
+
+
+def stream_dvf_to_silver(
+    output_path: Path,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    years: Iterable[int] = DVF_YEARS,
+    bronze_dir: Path = BRONZE_DIR,
+    storage: str = "csv",
+    manifest_path: Path = MANIFEST_PATH,
+) -> dict:
+    """
+    Read, clean and save DVF data chunk by chunk, so that peak memory depends on the chunk size, plus 8 bytes per kept
+    row of the current year: the row hashes used to reject duplicates across chunks.
+    For CSV, each cleaned chunk is appended to a temporary file which replaces the silver CSV once all chunks are written.
+    For Parquet, each cleaned chunk is appended to the partitioned dataset as new files.
+    Rows are compared on the hash of all their bronze columns, so the output is identical to the in-memory path
+    whatever the chunk size and the order of the bronze rows.
+
+    Args:
+        output_path (Path): Path to save the cleaned DVF CSV file or Parquet dataset directory.
+        chunksize (int): Maximum number of bronze rows held in memory at once.
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+        storage (str): "csv" or "parquet".
+        manifest_path (Path): Path of the manifest file, whose silver entry is dropped (see invalidate_silver_manifest).
+    Returns:
+        dict: Cleaning report, rows_out being the number of rows written to the silver layer.
+    """
+    invalidate_silver_manifest(manifest_path)
+    report = {}
+    if storage == "parquet":
+        for i, cleaned in enumerate(_iter_clean_chunks(chunksize, years, bronze_dir, report)):
+            save_partitioned(
+                cleaned,
+                output_path,
+                mode="overwrite" if i == 0 else "append",
+                basename_template=f"part-{i}-{{i}}.parquet",
+            )
+        return report
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for i, cleaned in enumerate(_iter_clean_chunks(chunksize, years, bronze_dir, report)):
+                cleaned.to_csv(f, index=False, header=(i == 0), sep=";")
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return report
+
+
+def update_silver_incrementally(
+    output_path: Path,
+    storage: str = "csv",
+    years: Iterable[int] = DVF_YEARS,
+    bronze_dir: Path = BRONZE_DIR,
+    manifest_path: Path = MANIFEST_PATH,
+    workers: int = DEFAULT_WORKERS,
+) -> tuple[list[int], dict]:
+    """
+    Re-clean only the years whose bronze file changed since the last run, and merge them into the existing silver output.
+    Falls back to a full rebuild when the silver output is missing or was written with another storage format.
+    The manifest is updated with the bronze fingerprints and the (code_commune, annee) group hashes of each cleaned year.
+
+    Args:
+        output_path (Path): Path of the cleaned DVF CSV file or Parquet dataset directory.
+        storage (str): "csv" or "parquet".
+        years (Iterable[int]): Years to read, 2020 to 2025 by default.
+        bronze_dir (Path): Directory containing the bronze DVF files.
+        manifest_path (Path): Path of the manifest file.
+        workers (int): Maximum number of worker processes used to re-clean the changed years.
+    Returns:
+        tuple[list[int], dict]: Years that were re-cleaned, and their cleaning report.
+    """
+    years = list(years)
+    manifest = load_manifest(manifest_path)
+    fingerprints = {year: file_fingerprint(dvf_file_path(year, bronze_dir)) for year in years}
+
+    silver_entry = manifest["silver"].get("cleaned_dvf_data", {})
+    built_years = silver_entry.get("years", {})
+    full_rebuild = not output_path.exists() or silver_entry.get("storage") != storage
+    changed_years = [
+        year for year in years
+        if full_rebuild or built_years.get(str(year), {}).get("source_sha256") != fingerprints[year]["sha256"]
+    ]
+    removed_years = [int(year) for year in built_years if int(year) not in years]
+    if not changed_years and not removed_years:
+        return [], merge_reports([])
+
+    if changed_years:
+        cleaned, report = clean_dvf_years(changed_years, workers, bronze_dir)
+    else:
+        cleaned, report = pd.DataFrame(), merge_reports([])
+
+    if full_rebuild:
+        save_to_silver(cleaned, output_path, storage)
+    elif storage == "parquet":
+        delete_partitions(output_path, [(year,) for year in changed_years + removed_years])
+        if changed_years:
+            save_partitioned(cleaned, output_path, mode="partitions")
+    else:
+        existing = pd.read_csv(output_path, sep=";", encoding="utf-8", header=0, float_precision="round_trip")
+        existing = existing[~existing["annee"].isin(changed_years + removed_years)]
+        merged = pd.concat([existing, cleaned], ignore_index=True).sort_values("annee", kind="stable")
+        save_to_silver(merged, output_path, storage)
+
+    if full_rebuild:
+        built_years = {}
+    for year in removed_years:
+        built_years.pop(str(year), None)
+    for year in changed_years:
+        year_df = cleaned[cleaned["annee"] == year]
+        built_years[str(year)] = {
+            "source_sha256": fingerprints[year]["sha256"],
+            "rows": len(year_df),
+            "groups": group_hashes(year_df),
+        }
+    for year, fingerprint in fingerprints.items():
+        manifest["bronze"][dvf_file_path(year, bronze_dir).name] = {**fingerprint, "annee": year}
+    manifest["silver"]["cleaned_dvf_data"] = {"storage": storage, "years": built_years}
+    save_manifest(manifest, manifest_path)
+    return changed_years, report
+
+
+def main(
+    streaming: bool = False,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    storage: str = "csv",
+    incremental: bool = False,
+    workers: int = DEFAULT_WORKERS,
+    metrics_path: Path | None = None,
+):
+    recorder = StageRecorder("clean")
+    output_path = silver_output_path("cleaned_dvf_data", storage)
+    if incremental:
+        with recorder.stage("update_silver_incrementally") as metrics:
+            changed_years, report = update_silver_incrementally(output_path, storage, workers=workers)
+            metrics["changed_years"] = changed_years
+    elif streaming:
+        with recorder.stage("stream_dvf_to_silver") as metrics:
+            report = stream_dvf_to_silver(output_path, chunksize, storage=storage)
+    elif storage == "parquet":
+        with recorder.stage("build_silver") as metrics:
+            report = build_silver(output_path, storage, workers)
+    else:
+        invalidate_silver_manifest()
+        with recorder.stage("clean_dvf_years") as metrics:
+            cleaned_dvf_data, report = clean_dvf_years(workers=workers)
+        with recorder.stage("save_to_silver", rows_in=len(cleaned_dvf_data)) as save_metrics:
+            save_to_silver(cleaned_dvf_data, output_path, storage)
+            save_metrics["rows_out"] = len(cleaned_dvf_data)
+    metrics.update(rows_in=report["rows_in"], rows_out=report["rows_out"])
+    save_cleaning_report(report, SILVER_DIR / "cleaned_dvf_data_report.json")
+    recorder.save(metrics_path_from_env(metrics_path))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+"""
+This module contains functions for building a rollup cube of price quantiles from mergeable t-digest sketches.
+
+The cube holds one cell per group of every subset of the grouping keys, e.g. (code_commune, annee, type_local,
+nombre_pieces_principales), (code_commune, annee), (annee,) or all of Paris. Each cell stores its number of sales,
+min, max, precomputed percentiles and the centroids of its sketch, so any granularity and any quantile can be
+answered from the gold layer. Coarser cells are merged from the finest ("leaf") cells, never from the silver layer.
+
+Rolled-up keys are left empty and the "grouping" column lists the keys of the cell ("*" for the grand total).
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from sketch import DEFAULT_COMPRESSION, compress, quantiles
+
+PERCENTILES = {"p10": 0.1, "p25": 0.25, "p50": 0.5, "p75": 0.75, "p90": 0.9}
+
+
+def grouping_name(keys: list[str]) -> str:
+    """
+    Return the value of the "grouping" column for cells grouped by `keys`.
+    """
+    return ",".join(keys) or "*"
+
+
+def _add_percentiles(cells: pd.DataFrame, centroids: pd.DataFrame, value: str, percentiles: dict) -> pd.DataFrame:
+    """
+    Add a column per percentile to cells sorted by cell_id, from centroids sorted by cell_id then mean.
+    """
+    sketch = (centroids["cell_id"].to_numpy(), centroids["mean"].to_numpy(), centroids["weight"].to_numpy())
+    mins = cells[f"{value}_min"].to_numpy()
+    maxs = cells[f"{value}_max"].to_numpy()
+    for name, q in percentiles.items():
+        cells[f"{value}_{name}"] = quantiles(*sketch, mins, maxs, q)
+    return cells
+
+
+def renumber_leaves(leaves: pd.DataFrame, centroids: pd.DataFrame, keys: list[str]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Sort leaf cells by keys and renumber them 0..n-1, updating the cell_id of their centroids.
+    Args:
+        leaves (pd.DataFrame): Leaf cells with a cell_id column.
+        centroids (pd.DataFrame): Centroids of the leaf cells.
+        keys (list[str]): Grouping keys.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Renumbered leaf cells and centroids.
+    """
+    leaves = leaves.sort_values(keys, ignore_index=True)
+    new_ids = pd.Series(np.arange(len(leaves)), index=leaves["cell_id"].to_numpy())
+    centroids = centroids[centroids["cell_id"].isin(new_ids.index)]
+    centroids = centroids.assign(cell_id=new_ids.loc[centroids["cell_id"].to_numpy()].to_numpy())
+    centroids = centroids.sort_values(["cell_id", "mean"], ignore_index=True)
+    leaves["cell_id"] = np.arange(len(leaves))
+    return leaves, centroids
+
+
+def build_leaf_sketches(
+    df: pd.DataFrame,
+    keys: list[str],
+    value: str = "prix_m2",
+    compression: float = DEFAULT_COMPRESSION,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Build the sketch of `value` for each group of `keys`, in a single vectorized pass over the rows.
+    Rows with a missing value are ignored; a missing key forms its own group, so that rolled-up cells count every row.
+
+    Args:
+        df (pd.DataFrame): Cleaned dataframe.
+        keys (list[str]): Grouping keys of the leaf cells.
+        value (str): Column to summarize.
+        compression (float): t-digest compression, see etl/sketch.py.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Leaf cells (cell_id, keys, nb_ventes, min, max) sorted by keys,
+            and their centroids (cell_id, mean, weight).
+    """
+    df = df.dropna(subset=[value])
+    grouped = df.groupby(keys, sort=True, observed=True, dropna=False)
+    leaves = grouped[value].agg(["size", "min", "max"]).reset_index()
+    leaves.columns = keys + ["nb_ventes", f"{value}_min", f"{value}_max"]
+    leaves.insert(0, "cell_id", np.arange(len(leaves)))
+    cell_ids, means, weights = compress(grouped.ngroup().to_numpy(), df[value].to_numpy(), compression=compression)
+    return leaves, pd.DataFrame({"cell_id": cell_ids, "mean": means, "weight": weights})
+
+
+def build_rollup_cube(
+    leaves: pd.DataFrame,
+    centroids: pd.DataFrame,
+    keys: list[str],
+    value: str = "prix_m2",
+    compression: float = DEFAULT_COMPRESSION,
+    percentiles: dict = PERCENTILES,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Merge leaf sketches into a cell for each group of every subset of `keys`, from the finest to the grand total.
+
+    Args:
+        leaves (pd.DataFrame): Leaf cells as returned by build_leaf_sketches (cell_id equal to the row number).
+        centroids (pd.DataFrame): Centroids of the leaf cells.
+        keys (list[str]): Grouping keys of the leaf cells.
+        value (str): Summarized column.
+        compression (float): t-digest compression, see etl/sketch.py.
+        percentiles (dict): {name: quantile} percentiles precomputed for each cell.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Cube cells (cell_id, grouping, keys, nb_ventes, min, percentiles, max),
+            and their centroids (cell_id, mean, weight).
+    """
+    min_col, max_col = f"{value}_min", f"{value}_max"
+    leaf_ids = centroids["cell_id"].to_numpy()
+    cells_list, centroids_list = [], []
+    next_id = 0
+    for size in range(len(keys), -1, -1):
+        for subset in map(list, combinations(keys, size)):
+            if subset:
+                grouped = leaves.groupby(subset, sort=True, observed=True, dropna=False)
+                parent_ids = grouped.ngroup().to_numpy()
+                cells = grouped.agg(
+                    nb_ventes=("nb_ventes", "sum"), **{min_col: (min_col, "min"), max_col: (max_col, "max")}
+                ).reset_index()
+            else:
+                parent_ids = np.zeros(len(leaves), dtype=np.int64)
+                cells = pd.DataFrame({
+                    "nb_ventes": [leaves["nb_ventes"].sum()],
+                    min_col: [leaves[min_col].min()],
+                    max_col: [leaves[max_col].max()],
+                })
+            cell_ids, means, weights = compress(
+                parent_ids[leaf_ids], centroids["mean"].to_numpy(), centroids["weight"].to_numpy(), compression
+            )
+            cells.insert(0, "cell_id", np.arange(len(cells)) + next_id)
+            cells.insert(1, "grouping", grouping_name(subset))
+            cells_list.append(cells)
+            centroids_list.append(pd.DataFrame({"cell_id": cell_ids + next_id, "mean": means, "weight": weights}))
+            next_id += len(cells)
+
+    cube = pd.concat(cells_list, ignore_index=True)
+    cube_centroids = pd.concat(centroids_list, ignore_index=True)
+    cube = _add_percentiles(cube, cube_centroids, value, percentiles)
+    cube = cube[["cell_id", "grouping"] + keys + ["nb_ventes", min_col]
+                + [f"{value}_{name}" for name in percentiles] + [max_col]]
+    return cube, cube_centroids
+
+
+def leaves_from_cube(cube: pd.DataFrame, centroids: pd.DataFrame, keys: list[str]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Extract the leaf cells of a cube and their centroids, to update the cube without reading the silver layer.
+    Args:
+        cube (pd.DataFrame): Cube cells.
+        centroids (pd.DataFrame): Cube centroids.
+        keys (list[str]): Grouping keys of the leaf cells.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Leaf cells and centroids, renumbered 0..n-1.
+    """
+    leaves = cube[cube["grouping"] == grouping_name(keys)]
+    leaves = leaves[["cell_id"] + keys + [c for c in cube.columns if c.endswith(("_min", "_max")) or c == "nb_ventes"]]
+    return renumber_leaves(leaves, centroids, keys)
+
+
+def query_cube(
+    cube: pd.DataFrame,
+    centroids: pd.DataFrame,
+    keys: list[str],
+    filters: dict,
+    q: float | None = None,
+    value: str = "prix_m2",
+) -> pd.DataFrame:
+    """
+    Return the cube cells at the granularity of the filtered keys, e.g. {"annee": 2023} returns all of Paris in 2023
+    and {"code_commune": 75101, "annee": [2022, 2023]} the 1st arrondissement for each year.
+    A quantile other than the precomputed percentiles can be requested with `q`, it is computed from the cell sketches.
+
+    Args:
+        cube (pd.DataFrame): Cube cells.
+        centroids (pd.DataFrame): Cube centroids.
+        keys (list[str]): Grouping keys of the cube.
+        filters (dict): {key: value} or {key: [values]} filters, the keys absent from filters are rolled up.
+        q (float | None): Additional quantile to compute, between 0 and 1.
+        value (str): Summarized column.
+    Returns:
+        pd.DataFrame: Matching cube cells.
+    """
+    grouping = grouping_name([key for key in keys if key in filters])
+    cells = cube[cube["grouping"] == grouping]
+    for key, wanted in filters.items():
+        if isinstance(wanted, (list, tuple, set, range)):
+            cells = cells[cells[key].isin(list(wanted))]
+        else:
+            cells = cells[cells[key] == wanted]
+    cells = cells.sort_values("cell_id", ignore_index=True)
+    if q is not None:
+        cell_centroids = centroids[centroids["cell_id"].isin(cells["cell_id"])]
+        cell_centroids = cell_centroids.sort_values(["cell_id", "mean"])
+        cells[f"{value}_q{q:g}"] = quantiles(
+            cell_centroids["cell_id"].to_numpy(),
+            cell_centroids["mean"].to_numpy(),
+            cell_centroids["weight"].to_numpy(),
+            cells[f"{value}_min"].to_numpy(),
+            cells[f"{value}_max"].to_numpy(),
+            q,
+        )
+    return cells
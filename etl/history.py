@@ -0,0 +1,252 @@
+"""
+This module ingests the commune-level DVF history file (donnees-valeurs-foncieres-a-la-commune_2014_2020.csv)
+into the silver layer.
+
+Every row of the file repeats the GeoJSON polygon of its arrondissement in the escaped "Geo Shape" column. The file is
+streamed in chunks, and each geometry is parsed only once, the first time its code_commune is seen: geometries are
+stored in a separate table keyed by code_commune (commune_geometries), and the yearly indicators (nbmut_*, vf_*,
+vfmed_*, vfm2_*) are written with compact dtypes (commune_history).
+The 2014-2019 median prices per square meter of apartments by number of rooms extend the agg_dvf_data series, the
+"5 rooms or more" medians being labelled apart from the exact room counts.
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import StageRecorder, metrics_path_from_env
+
+ROOT = Path(__file__).resolve().parents[1]
+BRONZE_DIR = ROOT / "data" / "bronze_layer"
+SILVER_DIR = ROOT / "data" / "silver_layer"
+
+HISTORY_FILE = "donnees-valeurs-foncieres-a-la-commune_2014_2020.csv"
+HISTORY_NAME = "commune_history"
+GEOMETRIES_NAME = "commune_geometries"
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# first year covered by the transaction-level DVF files, see DVF_YEARS in clean.py
+FIRST_DVF_YEAR = 2020
+
+# lower bound of the number of rooms of the price rows mapped from the history file: the t5 medians are for apartments
+# of OPEN_ENDED_PIECES rooms or more, not exactly OPEN_ENDED_PIECES as nombre_pieces_principales in agg_dvf_data
+PIECES_MIN_COLUMN = "nombre_pieces_min"
+OPEN_ENDED_PIECES = 5
+
+# nom_commune is taken from the arrondissement name column: "Nom Officiel Commune" is "Paris" for every row
+GEO_COLUMNS = ["codgeo_2020", "Nom Officiel Commune / Arrondissement Municipal Majuscule", "Geo Point", "Geo Shape"]
+KEY_DTYPES = {"anneemut": "int16", "codgeo_2020": "int32"}
+RENAMED_COLUMNS = {"anneemut": "annee", "codgeo_2020": "code_commune", "VF_ventevefa": "vf_ventevefa"}
+
+
+def _indicator_dtype(column: str) -> str | None:
+    """
+    Return the compact dtype of an indicator column: nullable Int32 counts, float32 medians per square meter,
+    float64 totals and medians of property values (which have cents beyond the float32 precision).
+    """
+    column = column.lower()
+    if column.startswith("nbmut"):
+        return "Int32"
+    if column.startswith("vfm2_"):
+        return "float32"
+    if column.startswith(("vf_", "vfmed_")):
+        return "float64"
+    return None
+
+
+def _is_ingested(column: str) -> bool:
+    return column in KEY_DTYPES or column in GEO_COLUMNS or _indicator_dtype(column) is not None
+
+
+def history_file_path(bronze_dir: Path = BRONZE_DIR) -> Path:
+    return bronze_dir / HISTORY_FILE
+
+
+def _history_dtypes(file_path: Path) -> dict:
+    """
+    Return the dtype of each ingested column, from the header of the history file.
+    """
+    header = pd.read_csv(file_path, sep=";", encoding="utf-8-sig", nrows=0).columns
+    dtypes = {column: _indicator_dtype(column) for column in header if _indicator_dtype(column)}
+    dtypes.update(KEY_DTYPES)
+    dtypes.update({column: "str" for column in GEO_COLUMNS if column != "codgeo_2020"})
+    return dtypes
+
+
+def _parse_geometries(chunk: pd.DataFrame, seen_codes: set) -> list[dict]:
+    """
+    Parse the geometry of each code_commune of a chunk not seen yet, one row per code_commune.
+    """
+    new_rows = chunk.loc[~chunk["codgeo_2020"].isin(seen_codes), GEO_COLUMNS].drop_duplicates("codgeo_2020")
+    geometries = []
+    for code_commune, nom_commune, geo_point, geo_shape in new_rows.itertuples(index=False):
+        seen_codes.add(code_commune)
+        latitude, longitude = (float(value) for value in geo_point.split(","))
+        geometries.append({
+            "code_commune": code_commune,
+            "nom_commune": nom_commune,
+            "longitude": longitude,
+            "latitude": latitude,
+            # re-serialized without spaces, the table keeps a single compact copy of each polygon
+            "geometry": json.dumps(json.loads(geo_shape), separators=(",", ":")),
+        })
+    return geometries
+
+
+def read_commune_history(
+    file_path: Path | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stream the commune-level DVF history file, parsing each distinct geometry once.
+    Args:
+        file_path (Path | None): Path of the history file, data/bronze_layer/donnees-valeurs-foncieres-a-la-commune_2014_2020.csv if None.
+        chunksize (int): Number of rows per chunk.
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Yearly indicators by (annee, code_commune) with compact dtypes,
+        and geometries by code_commune.
+    """
+    file_path = file_path or history_file_path()
+    reader = pd.read_csv(
+        file_path,
+        sep=";",
+        encoding="utf-8-sig",
+        usecols=_is_ingested,
+        dtype=_history_dtypes(file_path),
+        chunksize=chunksize,
+    )
+    indicators, geometries, seen_codes = [], [], set()
+    for chunk in reader:
+        geometries.extend(_parse_geometries(chunk, seen_codes))
+        # the geometry strings are dropped right away, only the parsed copy of each code_commune is kept
+        indicators.append(chunk.drop(columns=GEO_COLUMNS[1:]))
+
+    history_df = pd.concat(indicators, ignore_index=True).rename(columns=RENAMED_COLUMNS)
+    history_df = history_df.sort_values(["annee", "code_commune"], ignore_index=True)
+    key_columns = ["annee", "code_commune"]
+    history_df = history_df[key_columns + [column for column in history_df.columns if column not in key_columns]]
+    geometries_df = pd.DataFrame(
+        geometries, columns=["code_commune", "nom_commune", "longitude", "latitude", "geometry"]
+    ).astype({"code_commune": "int32"}).sort_values("code_commune", ignore_index=True)
+    return history_df, geometries_df
+
+
+def history_output_path(name: str, storage: str = "csv") -> Path:
+    return SILVER_DIR / (f"{name}.csv" if storage == "csv" else f"{name}.parquet")
+
+
+def save_history_table(df: pd.DataFrame, output_path: Path, storage: str = "csv") -> None:
+    """
+    Save a history table to the silver layer, as a CSV file or as a single Parquet file keeping the compact dtypes.
+    The tables are small (one row per commune and year), so they are not partitioned like cleaned_dvf_data.
+    Args:
+        df (pd.DataFrame): History or geometries dataframe.
+        output_path (Path): Path of the CSV or Parquet file.
+        storage (str): "csv" or "parquet".
+    Returns:
+        None.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if storage == "parquet":
+        df.to_parquet(output_path, index=False)
+        return
+    df.to_csv(output_path, index=False, header=True, sep=";", encoding="utf-8")
+
+
+def read_history_table(name: str = HISTORY_NAME, storage: str = "csv") -> pd.DataFrame:
+    """
+    Read a history table from the silver layer, restoring the compact dtypes of CSV files.
+    Args:
+        name (str): "commune_history" or "commune_geometries".
+        storage (str): "csv" or "parquet".
+    Returns:
+        pd.DataFrame: History or geometries dataframe.
+    """
+    file_path = history_output_path(name, storage)
+    if storage == "parquet":
+        return pd.read_parquet(file_path)
+    header = pd.read_csv(file_path, sep=";", encoding="utf-8", nrows=0).columns
+    dtypes = {"annee": "int16", "code_commune": "int32"}
+    dtypes.update({column: _indicator_dtype(column) for column in header if _indicator_dtype(column)})
+    return pd.read_csv(
+        file_path,
+        sep=";",
+        encoding="utf-8",
+        header=0,
+        dtype={column: dtype for column, dtype in dtypes.items() if column in header},
+        float_precision="round_trip",
+    )
+
+
+def history_to_agg_rows(history_df: pd.DataFrame, before_year: int = FIRST_DVF_YEAR) -> pd.DataFrame:
+    """
+    Map the median prices per square meter of apartment sales by number of rooms (vfm2_ventea_t1 to vfm2_ventea_t5)
+    to rows shaped like agg_dvf_data, for the years not covered by the transaction-level DVF files.
+    The history file only gives medians by number of rooms, so nb_ventes is <NA>.
+    vfm2_ventea_t5 counts 5 rooms or more, unlike nombre_pieces_principales = 5 in agg_dvf_data: its rows have a
+    missing nombre_pieces_principales, and nombre_pieces_min = 5 (see PIECES_MIN_COLUMN).
+    Args:
+        history_df (pd.DataFrame): Yearly indicators, as returned by read_commune_history.
+        before_year (int): Only years strictly before this one are kept.
+    Returns:
+        pd.DataFrame: Rows with the agg_dvf_data columns and nombre_pieces_min.
+    """
+    price_columns = {f"vfm2_ventea_t{rooms}": rooms for rooms in range(1, 6)}
+    history_df = history_df[history_df["annee"] < before_year]
+    agg_df = history_df.melt(
+        id_vars=["code_commune", "annee"],
+        value_vars=list(price_columns),
+        var_name=PIECES_MIN_COLUMN,
+        value_name="prix_m2_med",
+    ).dropna(subset=["prix_m2_med"])
+    agg_df[PIECES_MIN_COLUMN] = agg_df[PIECES_MIN_COLUMN].map(price_columns).astype("Int64")
+    agg_df["nombre_pieces_principales"] = agg_df[PIECES_MIN_COLUMN].astype("float64").where(
+        agg_df[PIECES_MIN_COLUMN] < OPEN_ENDED_PIECES
+    )
+    agg_df["type_local"] = "Appartement"
+    agg_df["prix_m2_med"] = agg_df["prix_m2_med"].astype("float64")
+    agg_df["nb_ventes"] = pd.array([pd.NA] * len(agg_df), dtype="Int64")
+    agg_df = agg_df.astype({"code_commune": "int64", "annee": "int64"})
+    agg_columns = ["code_commune", "annee", "type_local", "nombre_pieces_principales", "prix_m2_med", "nb_ventes"]
+    agg_df = agg_df[agg_columns + [PIECES_MIN_COLUMN]]
+    return agg_df.sort_values(["code_commune", "annee", PIECES_MIN_COLUMN], ignore_index=True)
+
+
+def extend_agg_with_history(agg_df: pd.DataFrame, history_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepend the history rows of the years before the first year of agg_df to the agg_dvf_data series.
+    The nombre_pieces_min column tells exact room counts (equal to nombre_pieces_principales) from the open-ended
+    "5 rooms or more" history rows (nombre_pieces_principales missing), so that they are never merged under one key.
+    Args:
+        agg_df (pd.DataFrame): Aggregated DVF dataframe, as returned by agg_dvf_by_arr_year.
+        history_df (pd.DataFrame): Yearly indicators, as returned by read_commune_history.
+    Returns:
+        pd.DataFrame: Aggregated DVF dataframe extended with the earlier years, with a nombre_pieces_min column.
+    """
+    first_year = int(agg_df["annee"].min()) if len(agg_df) else FIRST_DVF_YEAR
+    history_rows = history_to_agg_rows(history_df, before_year=first_year)
+    agg_df = agg_df.astype({"nb_ventes": "Int64"})
+    agg_df[PIECES_MIN_COLUMN] = agg_df["nombre_pieces_principales"].astype("Int64")
+    return pd.concat([history_rows, agg_df], ignore_index=True)
+
+
+def main(
+    storage: str = "csv",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    metrics_path: Path | None = None,
+):
+    recorder = StageRecorder("history")
+    with recorder.stage("read_commune_history") as metrics:
+        history_df, geometries_df = read_commune_history(chunksize=chunksize)
+        metrics.update(rows_out=len(history_df), geometries=len(geometries_df))
+    with recorder.stage("save_history_table", rows_in=len(history_df)) as metrics:
+        save_history_table(history_df, history_output_path(HISTORY_NAME, storage), storage)
+        save_history_table(geometries_df, history_output_path(GEOMETRIES_NAME, storage), storage)
+        metrics["rows_out"] = len(history_df)
+    recorder.save(metrics_path_from_env(metrics_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+This module contains a lightweight recorder of per-stage metrics for the ETL entry points.
+
+Each stage records its duration, rows in and out, and at the end of the stage the peak resident memory of the process
+(peak_rss_mb) and of its largest finished child process (peak_rss_children_mb), e.g. a worker of the process pool
+that cleans the years when workers > 1.
+Metrics are only written when a metrics path is given, or set in the ETL_METRICS_PATH environment variable:
+each run appends one JSON line, so the file keeps the history of production runs.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+METRICS_PATH_ENV = "ETL_METRICS_PATH"
+
+
+def peak_rss_mb(children: bool = False) -> float | None:
+    """
+    Return the peak resident memory in MB, None if it cannot be measured.
+    Args:
+        children (bool): Measure the largest terminated child process (e.g. pool workers) instead of the current one.
+    Returns:
+        float | None: Peak resident memory in MB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def metrics_path_from_env(metrics_path: Path | None = None) -> Path | None:
+    """
+    Return the metrics path given by the caller, or the one of the ETL_METRICS_PATH environment variable.
+    """
+    if metrics_path is not None:
+        return Path(metrics_path)
+    env_path = os.environ.get(METRICS_PATH_ENV)
+    return Path(env_path) if env_path else None
+
+
+class StageRecorder:
+    """
+    Record the metrics of the stages of an ETL run.
+
+    Usage:
+        recorder = StageRecorder("clean")
+        with recorder.stage("read_dvf_data") as metrics:
+            df = read_dvf_data()
+            metrics["rows_out"] = len(df)
+        recorder.save(metrics_path)
+    """
+
+    def __init__(self, entry_point: str):
+        self.entry_point = entry_point
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        """
+        Time a stage. The yielded dict can be updated with "rows_in", "rows_out" or any other metric.
+        """
+        metrics = {"name": name, "rows_in": rows_in, "rows_out": None}
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics["duration_s"] = round(time.perf_counter() - start, 6)
+            metrics["peak_rss_mb"] = peak_rss_mb()
+            metrics["peak_rss_children_mb"] = peak_rss_mb(children=True)
+            self.stages.append(metrics)
+
+    def to_dict(self) -> dict:
+        return {
+            "entry_point": self.entry_point,
+            "started_at": self.started_at.isoformat(),
+            "duration_s": round(time.perf_counter() - self._start, 6),
+            "stages": self.stages,
+        }
+
+    def save(self, metrics_path: Path | None) -> None:
+        """
+        Append the metrics of the run as a JSON line to `metrics_path`, do nothing if it is None.
+        """
+        if metrics_path is None:
+            return
+        metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(metrics_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_dict()) + "\n")
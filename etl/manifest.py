@@ -0,0 +1,119 @@
+"""
+This module contains functions for tracking the inputs and outputs of the ETL in a manifest (data/manifest.json).
+
+The manifest records:
+* bronze: content hash and row count of each bronze file.
+* silver: for each year, the hash of the bronze file it was cleaned from and a hash per (code_commune, annee) group.
+* gold: the silver group hashes each gold group was aggregated from.
+Comparing these entries tells which years must be re-cleaned and which groups must be re-aggregated.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+MANIFEST_PATH = ROOT / "data" / "manifest.json"
+
+GROUP_KEYS = ["code_commune", "annee"]
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _to_builtin(value):
+    """
+    Convert numpy scalars to Python scalars so they can be stored in JSON.
+    """
+    return value.item() if hasattr(value, "item") else value
+
+
+def file_fingerprint(file_path: Path) -> dict:
+    """
+    Compute the SHA-256 hash and the number of data rows (header excluded) of a CSV file in a single read.
+    Args:
+        file_path (Path): Path of the CSV file.
+    Returns:
+        dict: {"sha256": str, "rows": int}.
+    """
+    digest = hashlib.sha256()
+    n_lines = 0
+    last_block = b""
+    with open(file_path, "rb") as f:
+        while block := f.read(_BLOCK_SIZE):
+            digest.update(block)
+            n_lines += block.count(b"\n")
+            last_block = block
+    if last_block and not last_block.endswith(b"\n"):
+        n_lines += 1
+    return {"sha256": digest.hexdigest(), "rows": max(n_lines - 1, 0)}
+
+
+def group_hashes(df: pd.DataFrame, keys: list[str] = GROUP_KEYS) -> list[list]:
+    """
+    Hash the rows of each group of a dataframe.
+    Args:
+        df (pd.DataFrame): Dataframe to hash.
+        keys (list[str]): Grouping columns.
+    Returns:
+        list[list]: [*key_values, hash] for each group, sorted by key values.
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    groups = df.groupby(keys, observed=True, sort=True).indices
+    return [
+        [*(_to_builtin(v) for v in key), hashlib.sha256(row_hashes[idx].tobytes()).hexdigest()]
+        for key, idx in groups.items()
+    ]
+
+
+def load_manifest(manifest_path: Path = MANIFEST_PATH) -> dict:
+    """
+    Load the manifest, or return an empty one if it does not exist yet.
+    Args:
+        manifest_path (Path): Path of the manifest file.
+    Returns:
+        dict: Manifest with "bronze", "silver" and "gold" sections.
+    """
+    manifest = {"bronze": {}, "silver": {}, "gold": {}}
+    if manifest_path.exists():
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest.update(json.load(f))
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_path: Path = MANIFEST_PATH) -> None:
+    """
+    Save the manifest, replacing the previous file atomically.
+    Args:
+        manifest (dict): Manifest to save.
+        manifest_path (Path): Path of the manifest file.
+    Returns:
+        None.
+    """
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def drop_manifest_entries(entries: list[tuple[str, str]], manifest_path: Path = MANIFEST_PATH) -> None:
+    """
+    Remove entries of the manifest, so that the next incremental run rebuilds their outputs from scratch.
+    Called by the writers that rebuild an output without recording its group hashes.
+    Args:
+        entries (list[tuple[str, str]]): (section, name) entries, e.g. [("silver", "cleaned_dvf_data")].
+        manifest_path (Path): Path of the manifest file.
+    Returns:
+        None.
+    """
+    if not manifest_path.exists():
+        return
+    manifest = load_manifest(manifest_path)
+    if not any(name in manifest[section] for section, name in entries):
+        return
+    for section, name in entries:
+        manifest[section].pop(name, None)
+    save_manifest(manifest, manifest_path)
@@ -0,0 +1,140 @@
+"""
+This module contains a small engine applying declarative cleaning rules to a dataframe.
+
+A rule set is a list of rule specifications, for example:
+    {"name": "vente_only", "kind": "isin", "column": "nature_mutation", "values": ["Vente"]}
+Each rule is compiled into a function returning the boolean mask of the rows it keeps. The masks are combined into a
+single NumPy mask, so the dataframe is materialized once, and the number of rows rejected by each rule is reported.
+A row rejected by several rules is counted for the first of them, in rule set order.
+
+Supported kinds:
+* isin: keep rows whose `column` is in `values`.
+* notna: keep rows with no missing value in `columns`.
+* max: reject rows whose `column` is greater than `value` (missing values are kept).
+* greater_than: reject rows whose `column` is lower than or equal to `value` (missing values are kept).
+* bounds_by: reject rows whose `column` is outside the inclusive `bounds` {category: (min, max)} of their `by` category,
+  None meaning unbounded.
+* unique: reject duplicated rows over `subset` (all columns if missing), keeping the first occurrence.
+  Only rows kept by the previous rules are compared, so place it last.
+"""
+
+from collections.abc import Callable
+
+import numpy as np
+import pandas as pd
+
+RuleFunction = Callable[[pd.DataFrame, np.ndarray], np.ndarray]
+
+
+def _values(df: pd.DataFrame, column: str) -> np.ndarray:
+    """
+    Return a column as a float64 array, missing values as NaN.
+    """
+    return df[column].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _isin(column: str, values: list) -> RuleFunction:
+    return lambda df, mask: df[column].isin(values).to_numpy()
+
+
+def _notna(columns: list[str]) -> RuleFunction:
+    return lambda df, mask: np.logical_and.reduce([df[column].notna().to_numpy() for column in columns])
+
+
+def _max(column: str, value: float) -> RuleFunction:
+    return lambda df, mask: ~(_values(df, column) > value)
+
+
+def _greater_than(column: str, value: float) -> RuleFunction:
+    return lambda df, mask: ~(_values(df, column) <= value)
+
+
+def _bounds_by(column: str, by: str, bounds: dict) -> RuleFunction:
+    def rule(df: pd.DataFrame, mask: np.ndarray) -> np.ndarray:
+        values = _values(df, column)
+        categories = df[by]
+        keep = np.ones(len(df), dtype=bool)
+        for category, (low, high) in bounds.items():
+            in_category = (categories == category).to_numpy()
+            if low is not None:
+                keep &= ~(in_category & (values < low))
+            if high is not None:
+                keep &= ~(in_category & (values > high))
+        return keep
+
+    return rule
+
+
+def _unique(subset: list[str] | None = None) -> RuleFunction:
+    def rule(df: pd.DataFrame, mask: np.ndarray) -> np.ndarray:
+        # duplicated rows are identical, so they share the fate of the other rules: only compare remaining rows
+        kept = np.flatnonzero(mask)
+        keep = np.ones(len(df), dtype=bool)
+        keep[kept[df.iloc[kept].duplicated(subset=subset).to_numpy()]] = False
+        return keep
+
+    return rule
+
+
+RULE_KINDS = {
+    "isin": _isin,
+    "notna": _notna,
+    "max": _max,
+    "greater_than": _greater_than,
+    "bounds_by": _bounds_by,
+    "unique": _unique,
+}
+
+
+def compile_rules(rules: list[dict]) -> list[tuple[str, RuleFunction]]:
+    """
+    Compile rule specifications into (name, function) pairs.
+    Args:
+        rules (list[dict]): Rule specifications with a "name", a "kind" and the parameters of the kind.
+    Returns:
+        list[tuple[str, RuleFunction]]: Compiled rules, in rule set order.
+    """
+    compiled = []
+    for rule in rules:
+        params = {key: value for key, value in rule.items() if key not in ("name", "kind")}
+        if rule["kind"] not in RULE_KINDS:
+            raise ValueError(f"Unknown rule kind {rule['kind']!r} in rule {rule['name']!r}")
+        compiled.append((rule["name"], RULE_KINDS[rule["kind"]](**params)))
+    return compiled
+
+
+def evaluate_rules(df: pd.DataFrame, rules: list[dict]) -> tuple[np.ndarray, dict]:
+    """
+    Evaluate a rule set on a dataframe without copying it.
+    Args:
+        df (pd.DataFrame): Dataframe to check.
+        rules (list[dict]): Rule specifications.
+    Returns:
+        tuple[np.ndarray, dict]: Mask of the rows kept by every rule, and the report
+            {"rows_in": int, "rows_out": int, "rejected": {rule_name: int}}.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    rejected = {}
+    for name, rule in compile_rules(rules):
+        keep = rule(df, mask)
+        rejected[name] = int(np.count_nonzero(mask & ~keep))
+        mask &= keep
+    report = {"rows_in": len(df), "rows_out": int(np.count_nonzero(mask)), "rejected": rejected}
+    return mask, report
+
+
+def merge_reports(reports: list[dict]) -> dict:
+    """
+    Sum the reports of several evaluations, e.g. one per chunk or per year.
+    Args:
+        reports (list[dict]): Reports returned by evaluate_rules.
+    Returns:
+        dict: Combined report.
+    """
+    merged = {"rows_in": 0, "rows_out": 0, "rejected": {}}
+    for report in reports:
+        merged["rows_in"] += report.get("rows_in", 0)
+        merged["rows_out"] += report.get("rows_out", 0)
+        for name, count in report.get("rejected", {}).items():
+            merged["rejected"][name] = merged["rejected"].get(name, 0) + count
+    return merged
@@ -0,0 +1,65 @@
+"""
+This module contains a small scheduler running independent ETL units in a process pool.
+
+A unit is an independent piece of input (a DVF year file, an air quality station file, ...) and a pipeline
+is the list of stages applied to it (read -> clean -> write partition). Units of every source share the same pool,
+and results are always returned in submission order, so a parallel run produces the same output as a serial one.
+"""
+
+import os
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def _run_stages(stages: list[Callable], unit):
+    """
+    Apply each stage to the output of the previous one, starting from the unit.
+    """
+    result = unit
+    for stage in stages:
+        result = stage(result)
+    return result
+
+
+def run_sources(
+    sources: dict[str, tuple[Iterable, list[Callable]]],
+    workers: int = DEFAULT_WORKERS,
+) -> dict[str, list]:
+    """
+    Run the pipeline of each source on each of its units, in a process pool of `workers` processes.
+    Stages must be picklable: module-level functions or functools.partial of them.
+    With workers <= 1, units are run serially in the current process.
+
+    Args:
+        sources (dict): {source_name: (units, stages)}, e.g. {"dvf": (range(2020, 2026), [read, clean, write])}.
+        workers (int): Maximum number of worker processes.
+    Returns:
+        dict[str, list]: {source_name: [result of each unit, in unit order]}.
+    """
+    tasks = [(name, stages, unit) for name, (units, stages) in sources.items() for unit in units]
+    results = {name: [] for name in sources}
+    if workers <= 1 or len(tasks) <= 1:
+        for name, stages, unit in tasks:
+            results[name].append(_run_stages(stages, unit))
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        futures = [(name, executor.submit(_run_stages, stages, unit)) for name, stages, unit in tasks]
+        for name, future in futures:
+            results[name].append(future.result())
+    return results
+
+
+def run_pipeline(units: Iterable, stages: list[Callable], workers: int = DEFAULT_WORKERS) -> list:
+    """
+    Run a single pipeline on each unit, see run_sources.
+    Args:
+        units (Iterable): Units to process.
+        stages (list[Callable]): Stages applied to each unit.
+        workers (int): Maximum number of worker processes.
+    Returns:
+        list: Result of each unit, in unit order.
+    """
+    return run_sources({"pipeline": (units, stages)}, workers)["pipeline"]
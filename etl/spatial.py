@@ -0,0 +1,226 @@
+"""
+This module contains a spatial index assigning points (geocoded transactions, Airparif stations, RATP stops, ...)
+to the arrondissement polygons of data/gold_layer/arrondissements.geojson.
+
+At load time, a regular grid is laid over the bounding box of all polygons. Cells crossed by no polygon boundary are
+resolved to a single code, so most points are assigned by an array lookup. The remaining points are sorted by grid
+cell, and each polygon is only tested against the points of the cells its bounding box overlaps, with a vectorized
+even-odd point-in-polygon test.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+ARRONDISSEMENTS_PATH = ROOT / "data" / "gold_layer" / "arrondissements.geojson"
+
+# code returned for points outside every polygon
+NO_MATCH = -1
+
+# marks grid cells crossed by a polygon boundary, whose points are tested against polygons
+_BOUNDARY_CELL = -2
+
+DEFAULT_GRID_SIZE = 128
+
+# maximum number of (point, edge) pairs tested at once, bounds the memory of the point-in-polygon test
+_BLOCK_PAIRS = 1 << 22
+
+
+def _polygon_rings(geometry: dict) -> list[list[np.ndarray]]:
+    """
+    Return the rings of each polygon of a Polygon or MultiPolygon geometry, as (n, 2) lon/lat arrays.
+    """
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError(f"Unsupported geometry type {geometry['type']!r}")
+    return [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon] for polygon in polygons]
+
+
+def _points_in_rings(lon: np.ndarray, lat: np.ndarray, rings: list[np.ndarray]) -> np.ndarray:
+    """
+    Even-odd test of points against the rings of a polygon (exterior ring and holes), vectorized over points and edges.
+    """
+    x1 = np.concatenate([ring[:, 0] for ring in rings])
+    y1 = np.concatenate([ring[:, 1] for ring in rings])
+    x2 = np.concatenate([np.roll(ring[:, 0], -1) for ring in rings])
+    y2 = np.concatenate([np.roll(ring[:, 1], -1) for ring in rings])
+    inside = np.zeros(len(lon), dtype=bool)
+    block = max(1, _BLOCK_PAIRS // len(x1))
+    for start in range(0, len(lon), block):
+        px = lon[start:start + block, None]
+        py = lat[start:start + block, None]
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = np.count_nonzero(straddles & (px < x_cross), axis=1)
+        inside[start:start + block] = crossings % 2 == 1
+    return inside
+
+
+class SpatialIndex:
+    """
+    Grid index over polygons, each polygon carrying a code (e.g. code_commune).
+    Grid cells crossed by no polygon boundary are entirely inside one polygon or outside all of them: their code is
+    resolved once at load time. Only points falling in cells crossed by a boundary are tested against polygons.
+    When polygons overlap, a point gets the code of the first polygon containing it.
+    """
+
+    def __init__(self, codes: list[int], polygons: list[list[np.ndarray]], grid_size: int = DEFAULT_GRID_SIZE):
+        """
+        Args:
+            codes (list[int]): Code of each polygon.
+            polygons (list[list[np.ndarray]]): Rings of each polygon, exterior ring first.
+            grid_size (int): Number of grid cells along each axis.
+        """
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.polygons = polygons
+        self.bboxes = np.array([
+            [rings[0][:, 0].min(), rings[0][:, 1].min(), rings[0][:, 0].max(), rings[0][:, 1].max()]
+            for rings in polygons
+        ])
+        self.grid_size = grid_size
+        self.min_lon, self.min_lat = self.bboxes[:, 0].min(), self.bboxes[:, 1].min()
+        self.max_lon, self.max_lat = self.bboxes[:, 2].max(), self.bboxes[:, 3].max()
+        self.cell_width = (self.max_lon - self.min_lon) / grid_size or 1.0
+        self.cell_height = (self.max_lat - self.min_lat) / grid_size or 1.0
+
+        # grid cells overlapped by the bounding box of each polygon
+        self.polygon_cells = [self._cells_in_box(*bbox) for bbox in self.bboxes]
+
+        # cells crossed by a boundary (cells of the bounding box of each edge, a superset for long edges)
+        boundary = np.zeros(grid_size * grid_size, dtype=bool)
+        for rings in polygons:
+            for ring in rings:
+                boundary[self._edge_cells(ring)] = True
+
+        # code of the cells crossed by no boundary, from the polygon containing their center
+        self.cell_codes = np.full(grid_size * grid_size, NO_MATCH, dtype=np.int64)
+        resolved = boundary.copy()
+        for code, rings, cells in zip(self.codes, polygons, self.polygon_cells):
+            cells = cells[~resolved[cells]]
+            if len(cells) == 0:
+                continue
+            center_lon = self.min_lon + (cells % grid_size + 0.5) * self.cell_width
+            center_lat = self.min_lat + (cells // grid_size + 0.5) * self.cell_height
+            inside = cells[_points_in_rings(center_lon, center_lat, rings)]
+            self.cell_codes[inside] = code
+            resolved[inside] = True
+        self.cell_codes[boundary] = _BOUNDARY_CELL
+
+    def _cell_coords(self, lon: np.ndarray, lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        cols = np.clip(((lon - self.min_lon) / self.cell_width).astype(np.int64), 0, self.grid_size - 1)
+        rows = np.clip(((lat - self.min_lat) / self.cell_height).astype(np.int64), 0, self.grid_size - 1)
+        return cols, rows
+
+    def _cells_in_box(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        (col_min, col_max), (row_min, row_max) = self._cell_coords(np.array([min_lon, max_lon]), np.array([min_lat, max_lat]))
+        cols, rows = np.meshgrid(np.arange(col_min, col_max + 1), np.arange(row_min, row_max + 1))
+        return np.sort((rows * self.grid_size + cols).ravel())
+
+    def _edge_cells(self, ring: np.ndarray) -> np.ndarray:
+        """
+        Return the cells overlapped by the bounding box of each edge of a ring, vectorized over edges.
+        """
+        cols, rows = self._cell_coords(ring[:, 0], ring[:, 1])
+        next_cols, next_rows = np.roll(cols, -1), np.roll(rows, -1)
+        col_min, col_max = np.minimum(cols, next_cols), np.maximum(cols, next_cols)
+        row_min, row_max = np.minimum(rows, next_rows), np.maximum(rows, next_rows)
+        widths = col_max - col_min + 1
+        spans = widths * (row_max - row_min + 1)
+        edge = np.repeat(np.arange(len(ring)), spans)
+        offset = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+        return (row_min[edge] + offset // widths[edge]) * self.grid_size + col_min[edge] + offset % widths[edge]
+
+    @classmethod
+    def from_geojson(
+        cls,
+        geojson_path: Path = ARRONDISSEMENTS_PATH,
+        code_property: str = "c_arinsee",
+        grid_size: int = DEFAULT_GRID_SIZE,
+    ) -> "SpatialIndex":
+        """
+        Build the index from a GeoJSON FeatureCollection of Polygon / MultiPolygon features.
+        Args:
+            geojson_path (Path): Path of the GeoJSON file.
+            code_property (str): Feature property holding the code returned by lookups.
+            grid_size (int): Number of grid cells along each axis.
+        Returns:
+            SpatialIndex: Index over the polygons of the file.
+        """
+        with open(geojson_path, encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        codes, polygons = [], []
+        for feature in features:
+            for rings in _polygon_rings(feature["geometry"]):
+                codes.append(int(feature["properties"][code_property]))
+                polygons.append(rings)
+        return cls(codes, polygons, grid_size)
+
+    def lookup(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """
+        Return the code of the polygon containing each point, NO_MATCH for points outside every polygon
+        or with missing coordinates.
+        Args:
+            lon (np.ndarray): Longitudes.
+            lat (np.ndarray): Latitudes.
+        Returns:
+            np.ndarray: Code of each point.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        result = np.full(len(lon), NO_MATCH, dtype=np.int64)
+        in_grid = np.flatnonzero(
+            (lon >= self.min_lon) & (lon <= self.max_lon) & (lat >= self.min_lat) & (lat <= self.max_lat)
+        )
+        cols, rows = self._cell_coords(lon[in_grid], lat[in_grid])
+        cells = rows * self.grid_size + cols
+        cell_codes = self.cell_codes[cells]
+        on_boundary = cell_codes == _BOUNDARY_CELL
+        result[in_grid[~on_boundary]] = cell_codes[~on_boundary]
+
+        # points of boundary cells: test each polygon against the points of its own cells only
+        in_grid, cells = in_grid[on_boundary], cells[on_boundary]
+        order = np.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+        sorted_points = in_grid[order]
+
+        for code, rings, bbox, polygon_cells in zip(self.codes, self.polygons, self.bboxes, self.polygon_cells):
+            starts = np.searchsorted(sorted_cells, polygon_cells, side="left")
+            ends = np.searchsorted(sorted_cells, polygon_cells, side="right")
+            candidates = np.concatenate([sorted_points[s:e] for s, e in zip(starts, ends)] + [np.empty(0, np.int64)])
+            candidates = candidates[result[candidates] == NO_MATCH]
+            x, y = lon[candidates], lat[candidates]
+            in_bbox = (x >= bbox[0]) & (y >= bbox[1]) & (x <= bbox[2]) & (y <= bbox[3])
+            candidates, x, y = candidates[in_bbox], x[in_bbox], y[in_bbox]
+            if len(candidates):
+                result[candidates[_points_in_rings(x, y, rings)]] = code
+        return result
+
+
+def assign_code_commune(
+    df: pd.DataFrame,
+    index: SpatialIndex,
+    lon_column: str = "longitude",
+    lat_column: str = "latitude",
+) -> pd.Series:
+    """
+    Return the code_commune of each row of a dataframe from its coordinates, <NA> outside every arrondissement.
+    Args:
+        df (pd.DataFrame): Dataframe with longitude and latitude columns.
+        index (SpatialIndex): Spatial index over the arrondissements.
+        lon_column (str): Longitude column.
+        lat_column (str): Latitude column.
+    Returns:
+        pd.Series: code_commune of each row, aligned on df.
+    """
+    codes = index.lookup(
+        df[lon_column].to_numpy(dtype="float64", na_value=np.nan),
+        df[lat_column].to_numpy(dtype="float64", na_value=np.nan),
+    )
+    return pd.Series(codes, index=df.index, name="code_commune").astype("Int64").mask(codes == NO_MATCH)
@@ -0,0 +1,129 @@
+"""
+This module contains functions for storing silver and gold layer datasets in a partitioned columnar format.
+
+Datasets are written as Parquet files in a hive-style directory tree partitioned by year and commune:
+    <dataset>/annee=2023/code_commune=75101/part-0.parquet
+Readers only open the partitions matching the requested filters and only decode the requested columns.
+CSV files remain the export format of the silver and gold layers.
+"""
+
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARTITION_COLS = ["annee", "code_commune"]
+
+# save_partitioned modes and the matching pyarrow behaviour for partitions that already exist
+EXISTING_DATA_BEHAVIOR = {
+    "overwrite": "delete_matching",
+    "partitions": "delete_matching",
+    "append": "overwrite_or_ignore",
+}
+
+
+def _to_filter_expression(filters: dict | None) -> list[tuple] | None:
+    """
+    Convert {column: value} or {column: [values]} filters into pyarrow DNF filters.
+    Args:
+        filters (dict | None): Filters to convert.
+    Returns:
+        list[tuple] | None: pyarrow filters, or None when no filter is given.
+    """
+    if not filters:
+        return None
+    expression = []
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set, range)):
+            expression.append((column, "in", list(value)))
+        else:
+            expression.append((column, "==", value))
+    return expression
+
+
+def save_partitioned(
+    df: pd.DataFrame,
+    dataset_path: Path,
+    partition_cols: list[str] = PARTITION_COLS,
+    mode: str = "overwrite",
+    basename_template: str = "part-{i}.parquet",
+) -> None:
+    """
+    Save a dataframe as a Parquet dataset partitioned by `partition_cols`.
+
+    Args:
+        df (pd.DataFrame): Dataframe to save.
+        dataset_path (Path): Root directory of the dataset.
+        partition_cols (list[str]): Columns used to partition the dataset.
+        mode (str): "overwrite" replaces the whole dataset, "partitions" replaces only the partitions present in `df`,
+            "append" adds new files next to the existing ones (use a distinct `basename_template`).
+        basename_template (str): File name template of the written files, "{i}" is replaced by an index.
+    Returns:
+        None.
+    """
+    if mode not in EXISTING_DATA_BEHAVIOR:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {list(EXISTING_DATA_BEHAVIOR)}")
+    if mode == "overwrite" and dataset_path.exists():
+        shutil.rmtree(dataset_path)
+    dataset_path.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=str(dataset_path),
+        partition_cols=partition_cols,
+        basename_template=basename_template,
+        existing_data_behavior=EXISTING_DATA_BEHAVIOR[mode],
+    )
+
+
+def read_partitioned(
+    dataset_path: Path,
+    columns: list[str] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
+    """
+    Read a partitioned Parquet dataset, pushing column selection and filters down to the files.
+    Files are memory-mapped rather than read into intermediate buffers.
+
+    Args:
+        dataset_path (Path): Root directory of the dataset.
+        columns (list[str] | None): Columns to read, all columns if None.
+        filters (dict | None): {column: value} or {column: [values]} filters, e.g. {"annee": 2023, "code_commune": 75101}.
+    Returns:
+        pd.DataFrame: Dataframe with the requested columns, in the requested order.
+    """
+    if not dataset_path.exists():
+        raise FileNotFoundError(dataset_path)
+    table = pq.read_table(
+        str(dataset_path),
+        columns=columns,
+        filters=_to_filter_expression(filters),
+        partitioning="hive",
+        memory_map=True,
+    )
+    df = table.to_pandas()
+    # partition columns come last and may be decoded as categoricals, restore their plain dtype
+    for column in PARTITION_COLS:
+        if column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(df[column].cat.categories.dtype)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def delete_partitions(dataset_path: Path, partitions: list[tuple]) -> None:
+    """
+    Delete partitions of a dataset. Each partition is given by the values of the leading partition columns,
+    e.g. (2023,) deletes a whole year and (2023, 75101) one arrondissement of that year.
+    Args:
+        dataset_path (Path): Root directory of the dataset.
+        partitions (list[tuple]): Partition values, in PARTITION_COLS order.
+    Returns:
+        None.
+    """
+    for values in partitions:
+        partition_path = dataset_path.joinpath(*(f"{col}={val}" for col, val in zip(PARTITION_COLS, values)))
+        if partition_path.exists():
+            shutil.rmtree(partition_path)